@@ -0,0 +1,131 @@
+import os
+
+# Only mazes are generated, keep pygame quiet in every worker
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import json
+import multiprocessing
+import random
+import time
+
+import numpy as np
+
+import main
+
+# Column name and dtype of every per maze statistic, in file order
+COLUMNS = [
+    ("seed", np.int64),
+    ("dead_ends", np.int32),
+    ("exit_distance", np.int32),  # Steps along the path from the start cell to the exit
+    ("junctions", np.int32),  # Open cells with three or more open neighbours
+    ("longest_corridor", np.int32),  # Longest straight run of open cells
+]
+CHUNK_SEEDS = 64  # Seeds per task handed to a worker
+SUMMARY_PERCENTILES = [5, 50, 95]
+
+
+def longest_run(open_cells):
+    # Longest run of consecutive True values along the rows
+    padded = np.zeros((open_cells.shape[0], open_cells.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = open_cells
+    edges = np.diff(padded, axis=1)
+    starts = np.nonzero(edges.ravel() == 1)[0]
+    ends = np.nonzero(edges.ravel() == -1)[0]
+    return int((ends - starts).max()) if len(starts) else 0
+
+
+def maze_stats(maze):
+    open_cells = maze.grid == 0
+    interior = open_cells[1:-1, 1:-1]
+    cells = maze.open_cells()
+    exit_x, exit_y = maze.endpoint_pos
+    return (
+        len(maze.dead_ends),
+        int(cells.from_start[cells.numbers[exit_y, exit_x]]),
+        int(np.count_nonzero(interior & (maze.open_neighbour_counts() >= 3))),
+        max(longest_run(open_cells), longest_run(open_cells.T)),
+    )
+
+
+def analyze_seeds(task):
+    # One worker task: the statistics of a block of seeds as one array per column
+    seeds, width, height, algorithm = task
+    rows = [(seed,) + maze_stats(main.Maze(width, height, rng=random.Random(seed), algorithm=algorithm))
+            for seed in seeds]
+    return [np.array(column, dtype=dtype) for column, (_, dtype) in zip(zip(*rows), COLUMNS)]
+
+
+def tasks(seed_ranges, width, height, algorithm, chunk_seeds=CHUNK_SEEDS):
+    for start, stop in seed_ranges:
+        for first in range(start, stop, chunk_seeds):
+            yield range(first, min(first + chunk_seeds, stop)), width, height, algorithm
+
+
+def summarize(output):
+    # Count, mean, spread and percentiles of every column, read back from the column files
+    with open(os.path.join(output, "columns.json")) as f:
+        schema = json.load(f)
+    summary = {}
+    for name, dtype in schema["columns"].items():
+        if name == "seed":
+            continue
+        values = np.fromfile(os.path.join(output, f"{name}.bin"), dtype=dtype)
+        if not len(values):
+            continue  # No seeds, nothing to summarize
+        summary[name] = {"mean": float(values.mean()), "std": float(values.std()),
+                         "min": int(values.min()), "max": int(values.max())}
+        for q, value in zip(SUMMARY_PERCENTILES, np.percentile(values, SUMMARY_PERCENTILES)):
+            summary[name][f"p{q}"] = float(value)
+    return summary
+
+
+def run(args):
+    os.makedirs(args.output, exist_ok=True)
+    schema = {"width": args.width, "height": args.height, "algorithm": args.maze_algorithm, "count": 0,
+              "columns": {name: np.dtype(dtype).str for name, dtype in COLUMNS}}
+    files = [open(os.path.join(args.output, f"{name}.bin"), "wb") for name, _ in COLUMNS]
+    start = time.perf_counter()
+    try:
+        with multiprocessing.Pool(args.processes) as pool:
+            # In seed order, each block is appended to the column files as soon as it is done
+            for columns in pool.imap(analyze_seeds, tasks(args.seeds, args.width, args.height,
+                                                          args.maze_algorithm, args.chunk_seeds)):
+                for f, column in zip(files, columns):
+                    column.tofile(f)
+                schema["count"] += len(columns[0])
+    finally:
+        for f in files:
+            f.close()
+        with open(os.path.join(args.output, "columns.json"), "w") as f:
+            json.dump(schema, f, indent=2)
+    elapsed = time.perf_counter() - start
+
+    summary = summarize(args.output)
+    with open(os.path.join(args.output, "summary.json"), "w") as f:
+        json.dump({"count": schema["count"], "seconds": elapsed, "stats": summary}, f, indent=2)
+
+    print(f"{schema['count']} mazes in {elapsed:.2f}s ({schema['count'] / max(elapsed, 1e-9):.0f} mazes/s) "
+          f"on {args.processes} processes")
+    print(f"{'':18s}{'mean':>10s}{'std':>10s}{'min':>8s}" + "".join(f"{f'p{q}':>8s}" for q in SUMMARY_PERCENTILES)
+          + f"{'max':>8s}")
+    for name, stats in summary.items():
+        print(f"{name:18s}{stats['mean']:10.2f}{stats['std']:10.2f}{stats['min']:8d}"
+              + "".join(f"{stats[f'p{q}']:8.1f}" for q in SUMMARY_PERCENTILES) + f"{stats['max']:8d}")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Order of the Orderless maze statistics")
+    parser.add_argument("--seeds", type=int, nargs=2, action="append", metavar=("START", "STOP"),
+                        help="range of seeds to generate mazes from, can be given more than once (default 0 1000)")
+    parser.add_argument("--width", type=int, default=main.GRID_WIDTH)
+    parser.add_argument("--height", type=int, default=main.GRID_HEIGHT)
+    parser.add_argument("--maze-algorithm", choices=list(main.Maze.generators), default=main.MAZE_ALGORITHM)
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--chunk-seeds", type=int, default=CHUNK_SEEDS, help="seeds per worker task")
+    parser.add_argument("-o", "--output", default="analytics",
+                        help="directory for one raw column file per statistic, columns.json and summary.json")
+    args = parser.parse_args()
+    args.seeds = args.seeds or [(0, 1000)]
+    run(args)
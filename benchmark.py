@@ -0,0 +1,322 @@
+import os
+
+# Benchmarks run without a display or sound card
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import json
+import platform
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pygame
+
+import env
+import main
+
+MAZE_SIZES = [31, 101, 301, 1001]
+MAZE_ALGORITHMS = list(main.Maze.generators)
+STREAM_SIZE = (1001, 10001)  # Width and height of the maze streamed row by row with Eller's
+SIGHT_RADII = [3, 5, 10, 20]
+PHANTOM_COUNTS = [0, 50, 255]
+HUNTER_COUNTS = [100, 1000, 10000]
+ENV_POOL_SIZE = 64  # Environments stepped together by the pool benchmark
+REGRESSION_THRESHOLD = 0.10  # Slowdown (as a fraction) that counts as a regression
+
+
+def measure(fn, setup=None, repeat=7, number=None, min_time=0.2):
+    # Median and minimum seconds per call over `repeat` timed batches of `number` calls
+    if setup:
+        setup()
+    if number is None:
+        # Calibrate so one batch takes roughly min_time / repeat
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            if time.perf_counter() - start >= min_time / repeat or number >= 1 << 20:
+                break
+            number *= 2
+
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - start) / number)
+    return {"median": statistics.median(timings), "min": min(timings), "number": number, "repeat": repeat}
+
+
+def peak_memory(fn):
+    # Peak bytes allocated by Python and numpy during one call
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def make_game(seed):
+    random.seed(seed)
+    game = main.Game()
+    game.in_menu = False
+    game.start_game("Desperate")
+    game.music_loaded = True
+    game.update_camera()
+    game.interpolate(1)
+    return game
+
+
+def show_phantoms(game, count, seed):
+    # Make `count` phantoms visible on open cells other than the player's
+    rng = random.Random(seed)
+    player_cell = (game.player.position[0] // main.CELL_SIZE, game.player.position[1] // main.CELL_SIZE)
+    ys, xs = np.nonzero(game.maze.grid == 0)
+    cells = [cell for cell in zip(xs.tolist(), ys.tolist()) if cell != player_cell]
+    game.wallPhantoms.clear()
+    for _ in range(count):
+        game.wallPhantoms.spawn(*rng.choice(cells))
+
+
+def bench_maze(results, seed, sizes, algorithms):
+    for algorithm in algorithms:
+        for size in sizes:
+            def generate():
+                main.Maze(size, size, rng=random.Random(seed), algorithm=algorithm)
+
+            name = f"maze_generate[{algorithm},{size}x{size}]"
+            results[name] = measure(generate, repeat=3, number=1)
+            results[name]["peak_bytes"] = peak_memory(generate)
+
+
+def bench_maze_stream(results, seed, size=STREAM_SIZE):
+    # Eller's rows are consumed and dropped, so memory stays at a few rows however tall the maze
+    width, height = size
+
+    def stream():
+        for _ in main.Maze.eller_rows(width, height, random.Random(seed)):
+            pass
+
+    name = f"maze_stream[eller,{width}x{height}]"
+    results[name] = measure(stream, repeat=1, number=1)
+    results[name]["peak_bytes"] = peak_memory(stream)
+
+
+def bench_open_cells(results, seed, sizes):
+    # Building the index, then the spawn and teleport queries it answers
+    for size in sizes:
+        maze = main.Maze(size, size, rng=random.Random(seed))
+        rng = random.Random(seed)
+        cells = main.OpenCellIndex(maze)
+        results[f"open_cells_build[{size}x{size}]"] = measure(lambda: main.OpenCellIndex(maze), repeat=3, number=1)
+        results[f"open_cells_random[{size}x{size}]"] = measure(lambda: cells.random(rng, main.START_CELL))
+        results[f"open_cells_away[{size}x{size}]"] = measure(
+            lambda: cells.random_away(rng, main.DEATH_SPAWN_DISTANCE))
+        results[f"open_cells_nearest[{size}x{size}]"] = measure(
+            lambda: cells.nearest(rng.randrange(size), rng.randrange(size)))
+
+
+def bench_snapshot(results, seed, sizes, path):
+    # Packing a game in Desperate mode into a snapshot, then loading it back and running
+    # the first tick, which is the first time the open cell index and distance field are used
+    for size in sizes:
+        game = main.Game(headless=True, seed=seed, level_prefetch=0)
+        game.start_game("Desperate")
+        game.maze = game.player.maze = main.Maze(size, size, rng=random.Random(seed))
+        game.death.stop()
+        game.death = main.Death(game.maze, game.player, game.scheduler, rng=game.rng.death)
+        results[f"snapshot_save[{size}x{size}]"] = measure(game.snapshot)
+        with open(path, "wb") as f:
+            f.write(game.snapshot())
+
+        def load():
+            game.load_snapshot(path)
+            game.update()
+
+        results[f"snapshot_load[{size}x{size}]"] = measure(load, repeat=3, number=1)
+        results[f"snapshot_load[{size}x{size}]"]["bytes"] = os.path.getsize(path)
+        game.level_pipeline.stop()
+    os.remove(path)
+
+
+def bench_draw_grid(results, game, radii):
+    for radius in radii:
+        results[f"draw_grid[r={radius}]"] = measure(lambda: game.draw_grid(radius))
+
+
+def bench_phantoms(results, game, seed, counts):
+    for count in counts:
+        def setup():
+            show_phantoms(game, count, seed)
+            game.jumpscare_active = game.blackout_active = False
+
+        results[f"update_wallPhantoms[{count}]"] = measure(game.update_wallPhantoms, setup)
+        results[f"update_shake_factor[{count}]"] = measure(game.update_shake_factor, setup)
+        results[f"draw_arrow[{count}]"] = measure(game.draw_arrow, setup)
+        results[f"render[{count}]"] = measure(game.render, setup)
+
+
+def bench_hunters(results, game, seed, counts):
+    # The horde's step, collision check and drawing, with the flow field cached as it
+    # is between player moves, and building the flow field after one
+    player_cell = (game.player.position[0] // main.CELL_SIZE, game.player.position[1] // main.CELL_SIZE)
+    results["hunters_flow"] = measure(lambda: game.death.field.flow(player_cell))
+    for count in counts:
+        game.hunters = main.HunterCrowd(game.maze, game.player, game.scheduler, game.death.field, count,
+                                        rng=random.Random(seed))
+        game.hunters.stop()
+        results[f"hunters_step[{count}]"] = measure(game.hunters.step, game.hunters.stop)
+        results[f"hunters_collision[{count}]"] = measure(game.hunters.check_collision)
+        game.interpolate(0.5)
+        results[f"draw_death[hunters={count}]"] = measure(game.draw_death)
+    game.hunters = None
+
+
+def bench_env(results, seed, pool_size=ENV_POOL_SIZE):
+    # One environment step in process, then a step of the whole pool across worker processes
+    actions = np.random.default_rng(seed)
+    single = env.MazeEnv(seed=seed)
+    single.reset()
+
+    def step():
+        if any(single.step(int(actions.integers(len(env.ACTIONS))))[2:4]):
+            single.reset()
+
+    results["env_step"] = measure(step)
+    single.close()
+
+    pool = env.EnvPool(pool_size)
+    try:
+        pool.reset(seed)
+        results[f"env_pool_step[{pool_size}]"] = measure(
+            lambda: pool.step(actions.integers(len(env.ACTIONS), size=pool_size)))
+    finally:
+        pool.close()
+
+
+def bench_startup(results, repeat=5):
+    # Time to the first menu frame and to loaded audio, each in a fresh process.
+    # The first launch fills the sound cache and is not counted.
+    command = [sys.executable, "main.py", "--startup-time"]
+    subprocess.run(command, capture_output=True, check=True)
+    timings = {"first_frame": [], "audio_load": []}
+    for _ in range(repeat):
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        match = re.search(r"first frame after ([\d.]+) ms, audio loaded in ([\d.]+) ms", output)
+        timings["first_frame"].append(float(match.group(1)) / 1e3)
+        timings["audio_load"].append(float(match.group(2)) / 1e3)
+    for name, values in timings.items():
+        results[f"startup[{name}]"] = {"median": statistics.median(values), "min": min(values),
+                                       "number": 1, "repeat": repeat}
+
+
+def bench_replay(results, paths):
+    # Recorded sessions played back headless, a workload with real player input
+    for path in paths:
+        def replay():
+            playback = main.InputPlayback(path)
+            game = main.Game(headless=True, maze_algorithm=playback.algorithm, seed=playback.seed)
+            game.playback = playback
+            game.replay()
+
+        results[f"replay[{os.path.basename(path)}]"] = measure(replay, repeat=3, number=1)
+
+
+def run(args):
+    game = make_game(args.seed)
+    results = {}
+    bench_maze(results, args.seed, args.maze_sizes, args.maze_algorithms)
+    if not args.skip_stream:
+        bench_maze_stream(results, args.seed)
+    bench_open_cells(results, args.seed, args.maze_sizes)
+    bench_snapshot(results, args.seed, args.maze_sizes, args.output + ".sav")
+    bench_draw_grid(results, game, args.sight_radii)
+    bench_phantoms(results, game, args.seed, args.phantom_counts)
+    bench_hunters(results, game, args.seed, args.hunter_counts)
+    bench_env(results, args.seed)
+    pygame.quit()
+    bench_startup(results)
+    bench_replay(results, args.replay)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for name, result in results.items():
+        peak = f", peak {result['peak_bytes'] / 2 ** 20:.1f} MiB" if "peak_bytes" in result else ""
+        print(f"{name:36s} {result['median'] * 1e3:10.4f} ms  (min {result['min'] * 1e3:.4f} ms{peak})")
+    print(f"Results written to {args.output}")
+
+
+def compare(old_path, new_path, threshold):
+    # Print the per benchmark change between two runs, return True if anything regressed
+    with open(old_path) as f:
+        old = json.load(f)["results"]
+    with open(new_path) as f:
+        new = json.load(f)["results"]
+
+    regressed = False
+    for name in sorted(old.keys() | new.keys()):
+        if name not in old or name not in new:
+            print(f"{name:36s} {'only in ' + (old_path if name in old else new_path)}")
+            continue
+        ratio = new[name]["median"] / old[name]["median"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "REGRESSION"
+            regressed = True
+        elif ratio < 1 - threshold:
+            flag = "faster"
+        print(f"{name:36s} {old[name]['median'] * 1e3:10.4f} ms -> {new[name]['median'] * 1e3:10.4f} ms"
+              f"  {(ratio - 1) * 100:+7.1f}%  {flag}")
+    return regressed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Order of the Orderless benchmarks")
+    parser.add_argument("-o", "--output", default="benchmark.json", help="where to write the results")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--maze-sizes", type=int, nargs="+", default=MAZE_SIZES)
+    parser.add_argument("--maze-algorithms", choices=MAZE_ALGORITHMS, nargs="+", default=MAZE_ALGORITHMS)
+    parser.add_argument("--replay", nargs="+", default=[], metavar="FILE",
+                        help="input recordings (main.py --record) to time playing back headless")
+    parser.add_argument("--skip-stream", action="store_true", help="skip streaming a very tall maze")
+    parser.add_argument("--sight-radii", type=int, nargs="+", default=SIGHT_RADII)
+    parser.add_argument("--phantom-counts", type=int, nargs="+", default=PHANTOM_COUNTS)
+    parser.add_argument("--hunter-counts", type=int, nargs="+", default=HUNTER_COUNTS)
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                        help="compare two result files instead of running, exit 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="slowdown fraction flagged as a regression by --compare")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(args.compare[0], args.compare[1], args.threshold) else 0)
+
+    # Run from the repository root so the game finds SFX/
+    args.output = os.path.abspath(args.output)
+    args.replay = [os.path.abspath(path) for path in args.replay]
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    run(args)
@@ -0,0 +1,249 @@
+import os
+
+# Environments are headless, keep pygame quiet in every worker
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import multiprocessing
+import random
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import main
+
+# Observation channels, each a (2 * radius + 1) square around the player
+CHANNELS = ["wall", "exit", "death", "phantoms", "hunters"]
+VIEW_RADIUS = 7
+# Actions: stand still, move in one of main.DIRECTIONS, or hold E (clears the phantoms in Normal mode)
+ACTIONS = ["none", "up", "right", "down", "left", "hold_e"]
+FRAME_SKIP = 3  # Ticks per step, the player's move cooldown
+MAX_STEPS = 3000  # Steps before an episode is truncated
+
+
+class MazeEnv:
+    # The headless game as a gym style environment: reset(seed) -> (observation, info)
+    # and step(action) -> (observation, reward, terminated, truncated, info). An episode
+    # is one level, ending with +1 at the exit or -1 when Death or a hunter catches the
+    # player. Observations are uint8 arrays of shape (len(CHANNELS), size, size).
+    def __init__(self, mode="Normal", seed=None, view_radius=VIEW_RADIUS, frame_skip=FRAME_SKIP,
+                 max_steps=MAX_STEPS, maze_algorithm=main.MAZE_ALGORITHM):
+        self.mode = mode
+        self.view_radius = view_radius
+        self.frame_skip = frame_skip
+        self.max_steps = max_steps
+        self.maze_algorithm = maze_algorithm
+        self.observation_shape = (len(CHANNELS), 2 * view_radius + 1, 2 * view_radius + 1)
+        self.action_count = len(ACTIONS)
+        self.seeds = random.Random(seed)  # One game seed per episode
+        self.game = None
+        self.steps = 0
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.seeds = random.Random(seed)
+        self.close()
+        # No level prefetching, a worker thread per environment would not pay off
+        self.game = main.Game(headless=True, maze_algorithm=self.maze_algorithm,
+                              seed=self.seeds.getrandbits(32), level_prefetch=0)
+        self.game.start_game(self.mode)
+        self.steps = 0
+        return self.observe(), self.info()
+
+    def step(self, action):
+        game = self.game
+        if ACTIONS[action] == "hold_e":
+            game.player.direction = [0, 0]
+            if not game.e_key_down:
+                game.handle_input(main.pygame.event.Event(main.pygame.KEYDOWN, key=main.pygame.K_e))
+        else:
+            if game.e_key_down:
+                game.handle_input(main.pygame.event.Event(main.pygame.KEYUP, key=main.pygame.K_e))
+            dx, dy = main.DIRECTIONS[action - 1] if action else (0, 0)
+            game.player.direction = [dx * main.PLAYER_SPEED, dy * main.PLAYER_SPEED]
+
+        deaths = game.deaths
+        reward = 0.0
+        for _ in range(self.frame_skip):
+            game.update()
+            if game.deaths != deaths:
+                reward = -1.0
+                break
+            if game.player.reached_endpoint:
+                reward = 1.0
+                break
+        self.steps += 1
+        terminated = reward != 0
+        truncated = not terminated and self.steps >= self.max_steps
+        return self.observe(), reward, terminated, truncated, self.info()
+
+    def observe(self, out=None):
+        # Fills out (or a new array) with the view around the player
+        if out is None:
+            out = np.zeros(self.observation_shape, dtype=np.uint8)
+        game = self.game
+        r = self.view_radius
+        x = game.player.position[0] // main.CELL_SIZE
+        y = game.player.position[1] // main.CELL_SIZE
+        x0, y0 = x - r, y - r
+        size = 2 * r + 1
+        out[0] = game.maze.window(x0, y0, x0 + size, y0 + size)
+
+        def mark(channel, xs, ys):
+            # Entities per cell, saturating at 255
+            xs = np.asarray(xs) - x0
+            ys = np.asarray(ys) - y0
+            inside = (xs >= 0) & (xs < size) & (ys >= 0) & (ys < size)
+            counts = np.bincount(ys[inside] * size + xs[inside], minlength=size * size)
+            out[channel] = np.minimum(counts, 255).reshape(size, size)
+
+        mark(1, [game.maze.endpoint_pos[0]], [game.maze.endpoint_pos[1]])
+        mark(2, [game.death.position[0]], [game.death.position[1]])
+        mark(3, *game.wallPhantoms.positions())
+        if game.hunters is not None:
+            mark(4, game.hunters.xs, game.hunters.ys)
+        return out
+
+    def info(self):
+        return {"level": self.game.level, "deaths": self.game.deaths, "tick": self.game.scheduler.tick}
+
+    def close(self):
+        if self.game is not None:
+            self.game.level_pipeline.stop()
+            self.game = None
+
+
+def pool_worker(connection, shared_names, num_envs, indices, options):
+    # Steps the environments in indices, reading actions from and writing results to
+    # the pool's shared arrays. Finished environments are reset on the spot.
+    shared = {name: shared_memory.SharedMemory(name=shm_name) for name, shm_name in shared_names.items()}
+    arrays = EnvPool.views(shared, num_envs, options)
+    envs = {i: MazeEnv(**options) for i in indices}
+    try:
+        while True:
+            command, seed = connection.recv()
+            if command == "close":
+                break
+            for i, env in envs.items():
+                if command == "reset":
+                    env.reset(None if seed is None else seed + i)
+                    arrays["rewards"][i] = 0
+                    arrays["terminated"][i] = arrays["truncated"][i] = False
+                else:
+                    _, reward, terminated, truncated, _ = env.step(int(arrays["actions"][i]))
+                    arrays["rewards"][i] = reward
+                    arrays["terminated"][i] = terminated
+                    arrays["truncated"][i] = truncated
+                    if terminated or truncated:
+                        env.reset()
+                env.observe(arrays["observations"][i])
+            connection.send(command)
+    finally:
+        for env in envs.values():
+            env.close()
+        for memory in shared.values():
+            memory.close()
+
+
+class EnvPool:
+    # num_envs MazeEnvs stepped together by worker processes. Actions, observations,
+    # rewards and done flags live in shared memory, a step only sends each worker a
+    # short command and waits for its reply, so nothing is pickled per environment. The
+    # returned arrays are views into that memory, overwritten by the next step; an
+    # environment that finished is reset and its observation is the new episode's first.
+    def __init__(self, num_envs, num_workers=None, **options):
+        self.num_envs = num_envs
+        num_workers = min(num_envs, num_workers or os.cpu_count())
+        options["view_radius"] = options.get("view_radius", VIEW_RADIUS)
+        self.observation_shape = MazeEnv(**options).observation_shape
+        self.action_count = len(ACTIONS)
+
+        self.shared = {name: shared_memory.SharedMemory(create=True, size=dtype.itemsize * int(np.prod(shape)))
+                       for name, (dtype, shape) in self.layout(num_envs, options).items()}
+        self.arrays = self.views(self.shared, num_envs, options)
+        self.connections = []
+        self.workers = []
+        for worker_indices in np.array_split(np.arange(num_envs), num_workers):
+            parent, child = multiprocessing.Pipe()
+            worker = multiprocessing.Process(
+                target=pool_worker, daemon=True,
+                args=(child, {name: memory.name for name, memory in self.shared.items()}, num_envs,
+                      worker_indices.tolist(), options))
+            worker.start()
+            self.connections.append(parent)
+            self.workers.append(worker)
+
+    @staticmethod
+    def layout(num_envs, options):
+        # dtype and shape of every shared array
+        size = 2 * options["view_radius"] + 1
+        return {
+            "observations": (np.dtype(np.uint8), (num_envs, len(CHANNELS), size, size)),
+            "actions": (np.dtype(np.int8), (num_envs,)),
+            "rewards": (np.dtype(np.float32), (num_envs,)),
+            "terminated": (np.dtype(np.bool_), (num_envs,)),
+            "truncated": (np.dtype(np.bool_), (num_envs,)),
+        }
+
+    @staticmethod
+    def views(shared, num_envs, options):
+        return {name: np.ndarray(shape, dtype=dtype, buffer=shared[name].buf)
+                for name, (dtype, shape) in EnvPool.layout(num_envs, options).items()}
+
+    def command(self, command, seed=None):
+        for connection in self.connections:
+            connection.send((command, seed))
+        for connection in self.connections:
+            connection.recv()
+
+    def reset(self, seed=None):
+        # Environment i is seeded with seed + i
+        self.command("reset", seed)
+        return self.arrays["observations"]
+
+    def step(self, actions):
+        self.arrays["actions"][:] = actions
+        self.command("step")
+        return (self.arrays["observations"], self.arrays["rewards"], self.arrays["terminated"],
+                self.arrays["truncated"])
+
+    def close(self):
+        if not self.workers:
+            return
+        for connection in self.connections:
+            connection.send(("close", None))
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+        for memory in self.shared.values():
+            memory.close()
+            memory.unlink()
+
+
+if __name__ == "__main__":
+    # Random actions through a pool, to check it runs and measure steps per second
+    parser = argparse.ArgumentParser(description="Order of the Orderless environment pool")
+    parser.add_argument("--envs", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--mode", choices=main.REPLAY_MODES, default="Normal")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    pool = EnvPool(args.envs, args.workers, mode=args.mode)
+    actions = np.random.default_rng(args.seed)
+    try:
+        pool.reset(args.seed)
+        episodes = wins = 0
+        start = time.perf_counter()
+        for _ in range(args.steps):
+            _, rewards, terminated, truncated = pool.step(actions.integers(len(ACTIONS), size=args.envs))
+            episodes += int(np.count_nonzero(terminated | truncated))
+            wins += int(np.count_nonzero(rewards > 0))
+        elapsed = time.perf_counter() - start
+    finally:
+        pool.close()
+    print(f"{args.envs * args.steps} environment steps in {elapsed:.2f}s "
+          f"({args.envs * args.steps / elapsed:.0f} steps/s) on {args.workers} workers, "
+          f"{episodes} episodes finished, {wins} exits reached")
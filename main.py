@@ -1,857 +1,2844 @@
-import pygame
-import pygame.mixer
-import random
-import time
-import math
-import os
-import threading
-
-# Constants
-CELL_SIZE = 30
-GRID_WIDTH = 30  # Reduced grid width
-GRID_HEIGHT = 30  # Reduced grid height
-SCREEN_WIDTH = 800
-SCREEN_HEIGHT = 600
-PLAYER_SPEED = CELL_SIZE
-COOLDOWN_TIME = 0.1
-DEATH_COLOR = (255, 55, 55)
-DEATH_SCREEN_COLOR = (255, 0, 0)
-DEATH_SCREEN_TEXT_COLOR = (255, 255, 255)
-FPS = 30
-
-
-# Directions for DFS
-DIRECTIONS = [(0, -1), (1, 0), (0, 1), (-1, 0)]  # Up, Right, Down, Left
-
-
-class Maze:
-    def __init__(self):
-        self.grid = self.init_grid()
-        self.endpoint_pos = self.generate_maze()
-
-    @staticmethod
-    def init_grid():
-        grid = [[1 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
-        for y in range(1, GRID_HEIGHT, 2):
-            for x in range(1, GRID_WIDTH, 2):
-                grid[y][x] = 0  # Open space
-        return grid
-
-    def carve_passages_from(self, cx, cy):
-        stack = [(cx, cy)]
-        visited = set()
-        visited.add((cx, cy))
-
-        while stack:
-            (cx, cy) = stack[-1]
-            directions = DIRECTIONS[:]
-            random.shuffle(directions)
-            carved = False
-
-            for direction in directions:
-                nx, ny = cx + direction[0] * 2, cy + direction[1] * 2
-                if 0 <= nx < GRID_WIDTH and 0 <= ny < GRID_HEIGHT and (nx, ny) not in visited and self.grid[ny][nx] == 0:
-                    wall_x, wall_y = cx + direction[0], cy + direction[1]
-                    self.grid[wall_y][wall_x] = 0  # Remove the wall
-                    self.grid[ny][nx] = 0
-                    stack.append((nx, ny))
-                    visited.add((nx, ny))
-                    carved = True
-                    break
-
-            if not carved:
-                stack.pop()
-
-    def generate_maze(self):
-        start_x, start_y = 1, 1  # Start in the first open cell
-        self.carve_passages_from(start_x, start_y)
-
-        # Find all the dead ends in the maze
-        dead_ends = []
-        for y in range(1, GRID_HEIGHT - 1):
-            for x in range(1, GRID_WIDTH - 1):
-                if self.grid[y][x] == 0:  # Check if it's an open space
-                    count = sum(self.grid[y + dy][x + dx] == 0 for dx, dy in DIRECTIONS)
-                    if count == 1:  # If it's a dead end
-                        dead_ends.append((x, y))
-
-        # Choose a random dead end to place the exit
-        random.shuffle(dead_ends)
-        exit_pos = None
-        for x, y in dead_ends:
-            if abs(x - start_x) > 2 or abs(y - start_y) > 2:
-                exit_pos = (x, y)
-                break
-
-        # If no suitable dead end is found, choose a random open space
-        if exit_pos is None:
-            exit_pos = random.choice([(x, y) for y in range(1, GRID_HEIGHT - 1) for x in range(1, GRID_WIDTH - 1) if self.grid[y][x] == 0])
-
-        # Set exit in the grid
-        self.grid[exit_pos[1]][exit_pos[0]] = 0
-        return exit_pos
-    
-class Player:
-    def __init__(self, maze):
-        self.position = [CELL_SIZE, CELL_SIZE]
-        self.direction = [0, 0]
-        self.last_move_time = time.time()
-        self.reached_endpoint = False
-        self.maze = maze
-
-    def move(self):
-        current_time = time.time()
-        if current_time - self.last_move_time >= COOLDOWN_TIME:
-            new_x = self.position[0] + self.direction[0]
-            new_y = self.position[1] + self.direction[1]
-            grid_x, grid_y = new_x // CELL_SIZE, new_y // CELL_SIZE
-            if 0 <= grid_x < GRID_WIDTH and 0 <= grid_y < GRID_HEIGHT and self.maze.grid[grid_y][grid_x] == 0:
-                self.position[0] = new_x
-                self.position[1] = new_y
-                self.last_move_time = current_time
-                if (grid_x, grid_y) == self.maze.endpoint_pos:
-                    self.reached_endpoint = True  # Set flag if the player reaches the endpoint
-
-    def handle_event(self, event):
-        if event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_UP:
-                self.direction = [0, -PLAYER_SPEED]
-            elif event.key == pygame.K_DOWN:
-                self.direction = [0, PLAYER_SPEED]
-            elif event.key == pygame.K_LEFT:
-                self.direction = [-PLAYER_SPEED, 0]
-            elif event.key == pygame.K_RIGHT:
-                self.direction = [PLAYER_SPEED, 0]
-        elif event.type == pygame.KEYUP:
-            if event.key in [pygame.K_UP, pygame.K_DOWN, pygame.K_LEFT, pygame.K_RIGHT]:
-                self.direction = [0, 0]
-
-    def reset(self):
-        self.position = [CELL_SIZE, CELL_SIZE]
-        self.reached_endpoint = False
-
-class Death:
-    def __init__(self, maze, player):
-        self.maze = maze
-        self.player = player
-        self.position = self.spawn_faraway()
-        self.move_interval = 5.0
-        self.speed_increase = 0.1
-        self.moving = True
-        self.lock = threading.Lock()
-        self.start_movement_thread()
-
-    def spawn_faraway(self):
-        while True:
-            x, y = self.maze.endpoint_pos
-            while True:
-                try:
-                    x += random.choice([-1, 0, 1])
-                    y += random.choice([-1, 0, 1])
-                    if (
-                        0 <= x < len(self.maze.grid[0]) and
-                        0 <= y < len(self.maze.grid) and
-                        self.maze.grid[y][x] == 0 and
-                        abs(x - self.player.position[0] // CELL_SIZE) > 5 and
-                        abs(y - self.player.position[1] // CELL_SIZE) > 5
-                    ):
-                        return x, y
-                except IndexError:
-                    continue
-
-    def move_towards_player(self):
-        while self.moving:
-            try:
-                player_x = self.player.position[0] // CELL_SIZE
-                player_y = self.player.position[1] // CELL_SIZE
-
-                with self.lock:
-                    if self.position[0] < player_x:
-                        self.position = (self.position[0] + 1, self.position[1])
-                    elif self.position[0] > player_x:
-                        self.position = (self.position[0] - 1, self.position[1])
-                    if self.position[1] < player_y:
-                        self.position = (self.position[0], self.position[1] + 1)
-                    elif self.position[1] > player_y:
-                        self.position = (self.position[0], self.position[1] - 1)
-
-                time.sleep(self.move_interval)
-                self.move_interval = max(0.1, self.move_interval - self.speed_increase)
-
-                if self.check_collision():
-                    self.moving = False
-                    return True
-            except Exception as e:
-                print(f"An error occurred: {e}")
-                self.moving = False
-                return False
-        return False
-
-    def check_collision(self):
-        with self.lock:
-            return self.position == (self.player.position[0] // CELL_SIZE, self.player.position[1] // CELL_SIZE)
-
-    def start_movement_thread(self):
-        movement_thread = threading.Thread(target=self.move_towards_player)
-        movement_thread.daemon = True
-        movement_thread.start()
-
-class WallPhantom:
-    def __init__(self):
-        self.x = random.randint(0, GRID_WIDTH - 1)
-        self.y = random.randint(0, GRID_HEIGHT - 1)
-        self.visible = False
-        self.last_move_time = 0
-
-    def appear(self):
-        self.x = random.randint(0, GRID_WIDTH - 1)
-        self.y = random.randint(0, GRID_HEIGHT - 1)
-        self.visible = True
-        self.last_move_time = time.time()
-
-    def disappear(self):
-        self.visible = False
-
-    def check_collision(self, player_position):
-        return (self.x, self.y) == (player_position[0] // CELL_SIZE, player_position[1] // CELL_SIZE)
-
-    def update(self):
-        pass
-
-
-class Game:
-    def __init__(self):
-        pygame.init()
-        pygame.mixer.init()
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-        pygame.display.set_caption('Order of the Orderless')
-        self.clock = pygame.time.Clock()
-        self.maze = Maze()
-        self.player = Player(self.maze)
-        self.death = Death(self.maze, self.player)
-        self.init_enemies()
-        self.shake_factor = 0
-        self.fullscreen = False
-        self.running = True
-
-        self.enemy_spawn_timer = 0
-        self.enemy_spawn_interval = 35
-
-        self.jumpscare_duration = 0.5
-        self.jumpscare_timer = 0
-        self.jumpscare_active = False
-
-        self.jumpscare_sound = pygame.mixer.Sound(os.path.join("SFX", "phantomJump1.mp3"))
-        self.death_sound = pygame.mixer.Sound(os.path.join("SFX", "phantomJump2.mp3"))
-        self.music_loaded = False
-        pygame.mixer.music.load(os.path.join("SFX", "ambience.mp3"))
-        pygame.mixer.music.set_volume(0.5)
-
-        self.blackout_duration = 0.2
-        self.blackout_timer = 0
-        self.blackout_active = False
-        self.base_surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-
-        # Cooldown variables
-        self.cooldown_active = False
-        self.cooldown_timer = 0
-        self.cooldown_duration = 5
-        self.in_menu = True
-
-        # Total time variable
-        self.total_time = 0  
-        self.game_mode_selected = False
-        self.game_mode = None
-
-        self.level = 0
-        self.timer_running = True
-        self.death_occurred = False
-
-        self.e_key_held_time = 0
-        self.e_key_down = False
-        self.E_HOLD_TIME = 3
-
-        self.fade_in = True
-        self.fade_alpha = 0
-        self.fade_last_time = time.time()
-        self.fade_interval = 1
-
-    def show_death_screen(self):
-        self.death_occurred = True
-        self.reset(due_to_death=True)
-        self.in_menu = True
-
-        pygame.mixer.music.stop()
-        self.death_sound.play()
-
-        self.screen.fill(DEATH_SCREEN_COLOR)
-        font = pygame.font.SysFont(None, 36)
-        text = font.render("Death caught up to you", True, DEATH_SCREEN_TEXT_COLOR)
-        text_rect = text.get_rect(center=(SCREEN_WIDTH * CELL_SIZE // 2, SCREEN_HEIGHT * CELL_SIZE // 2))
-        self.screen.blit(text, text_rect)
-        pygame.display.flip()
-        pygame.time.wait(2000)
-
-    def run(self):
-        while self.running:
-            if self.in_menu:
-                self.main_menu()
-            else:
-
-                if not self.music_loaded:
-                    pygame.mixer.music.play(loops=-1)
-                    self.music_loaded = True
-               
-                self.handle_events()
-                self.player.move()
-                self.update_wallPhantoms()
-                self.update_shake_factor()
-                self.update_camera()
-
-                if self.check_for_enemy_encounter():
-                    self.jumpscare_active = True
-                    self.jumpscare_timer = 0
-
-                if self.death.check_collision():
-                    self.show_death_screen()
-                
-                if self.jumpscare_active:
-                    self.jumpscare_timer += 1
-                    if self.jumpscare_timer >= self.jumpscare_duration * 30:
-                        self.jumpscare_active = False
-                        self.jumpscare_timer = 0
-                
-                if self.blackout_active:
-                    self.blackout_timer += 1
-                    if self.blackout_timer >= self.blackout_duration * 30:
-                        self.blackout_active = False
-                        self.blackout_timer = 0
-                
-                self.render()
-                self.clock.tick(30)
-                if self.timer_running:
-                    self.total_time += 1
-                
-        pygame.quit()
-
-    def main_menu(self):
-        title_font = pygame.font.Font(None, int(60 * SCREEN_WIDTH / 800))  # Scale font size based on screen width
-        title_text = title_font.render("Order of the Orderless", True, (255, 255, 255))
-        title_rect = title_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 4))
-
-        button_width = int(200 * SCREEN_WIDTH / 800)  # Scale button width based on screen width
-        button_height = int(100 * SCREEN_HEIGHT / 600)  # Scale button height based on screen height
-
-        start_button_rect = pygame.Rect(SCREEN_WIDTH // 2 - button_width // 2, SCREEN_HEIGHT // 2 - button_height // 2, button_width, button_height)
-        quit_button_rect = pygame.Rect(SCREEN_WIDTH // 2 - button_width // 2, SCREEN_HEIGHT // 2 + button_height // 2 + 50, button_width, button_height)
-
-        while self.in_menu:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    self.running = False
-                    self.in_menu = False
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        self.running = False
-                        self.in_menu = False
-                    elif event.key == pygame.K_F11:
-                        # Toggle full screen mode on F11 key press
-                        self.fullscreen = not self.fullscreen
-                        if self.fullscreen:
-                            screen_info = pygame.display.Info()
-                            screen_width = screen_info.current_w
-                            screen_height = screen_info.current_h
-                            self.screen = pygame.display.set_mode((screen_width, screen_height), pygame.FULLSCREEN)
-                        else:
-                            self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-                elif event.type == pygame.MOUSEBUTTONDOWN:
-                    if start_button_rect.collidepoint(event.pos):
-                        self.show_game_modes()
-                    elif quit_button_rect.collidepoint(event.pos):
-                        self.running = False
-                        self.in_menu = False
-
-            if self.fullscreen:
-                screen_width, screen_height = self.screen.get_width(), self.screen.get_height()
-            else:
-                screen_width, screen_height = SCREEN_WIDTH, SCREEN_HEIGHT
-
-            self.screen.fill((0, 0, 0))
-
-            # Draw title
-            self.screen.blit(title_text, title_rect)
-
-            font = pygame.font.Font(None, int(36 * SCREEN_WIDTH / 800))  # Scale font size based on screen width
-
-            # Draw Start Game button outline
-            pygame.draw.rect(self.screen, (255, 255, 255), start_button_rect, 2)
-            start_text = font.render("Start Game", True, (255, 255, 255))
-            self.screen.blit(start_text, (start_button_rect.centerx - start_text.get_width() // 2,
-                                        start_button_rect.centery - start_text.get_height() // 2))
-
-            # Draw Quit button outline
-            pygame.draw.rect(self.screen, (255, 255, 255), quit_button_rect, 2)
-            quit_text = font.render("Quit", True, (255, 255, 255))
-            self.screen.blit(quit_text, (quit_button_rect.centerx - quit_text.get_width() // 2,
-                                        quit_button_rect.centery - quit_text.get_height() // 2))
-
-            pygame.display.flip()
-
-    def show_game_modes(self):
-        title_font = pygame.font.Font(None, 60)
-        title_text = title_font.render("Select Game Mode", True, (255, 255, 255))
-        title_rect = title_text.get_rect(center=(SCREEN_WIDTH // 1.9, SCREEN_HEIGHT // 4))
-
-
-        normal_button_rect = pygame.Rect(100, SCREEN_HEIGHT // 2 - 50, 300, 100)
-        desperate_button_rect = pygame.Rect(450, SCREEN_HEIGHT // 2 - 50, 300, 100)
-
-        while self.in_menu:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    self.running = False
-                    self.in_menu = False
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        self.running = False
-                        self.in_menu = False
-                    elif event.key == pygame.K_F11:
-                        # Toggle full screen mode on F11 key press
-                        self.fullscreen = not self.fullscreen
-                        if self.fullscreen:
-                            screen_info = pygame.display.Info()
-                            screen_width = screen_info.current_w
-                            screen_height = screen_info.current_h
-                            self.screen = pygame.display.set_mode((screen_width, screen_height), pygame.FULLSCREEN)
-                        else:
-                            self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-                elif event.type == pygame.MOUSEBUTTONDOWN:
-                    if normal_button_rect.collidepoint(event.pos):
-                        self.in_menu = False
-                        self.start_game("Normal")
-                    elif desperate_button_rect.collidepoint(event.pos):
-                        self.in_menu = False
-                        self.start_game("Desperate")
-                
-                if self.fullscreen:
-                    screen_width, screen_height = self.screen.get_width(), self.screen.get_height()
-                else:
-                    screen_width, screen_height = SCREEN_WIDTH, SCREEN_HEIGHT
-
-            self.screen.fill((0, 0, 0))
-            font = pygame.font.Font(None, 36)
-
-            self.screen.blit(title_text, title_rect)
-
-            # Draw Normal mode button
-            pygame.draw.rect(self.screen, (0, 255, 0), normal_button_rect)
-            normal_text = font.render("Normal Survival Mode", True, (255, 255, 255))
-            self.screen.blit(normal_text, (normal_button_rect.centerx - normal_text.get_width() // 2,
-                                        normal_button_rect.centery - normal_text.get_height()))
-
-            # Draw Desperate mode button
-            pygame.draw.rect(self.screen, (255, 0, 0), desperate_button_rect)
-            desperate_text = font.render("Desperate Survival Mode", True, (255, 255, 255))
-            self.screen.blit(desperate_text, (desperate_button_rect.centerx - desperate_text.get_width() // 2,
-                                            desperate_button_rect.centery - desperate_text.get_height()))
-
-            pygame.display.flip()
-
-    def start_game(self, mode):
-        self.in_menu = False
-        if mode == "Normal":
-            self.game_mode = "Normal"
-        elif mode == "Desperate":
-            self.game_mode = "Desperate"
-        self.reset()
-
-    def handle_events(self):
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                self.running = False
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    self.running = False
-                elif event.key == pygame.K_F11:
-                    # Toggle full screen mode on F11 key press
-                    self.fullscreen = not self.fullscreen
-                    if self.fullscreen:
-                        self.screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
-                    else:
-                        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-                elif event.key == pygame.K_RETURN and self.player.reached_endpoint:
-                    self.reset()
-                elif event.key == pygame.K_e and self.game_mode == "Normal":
-                    if not self.cooldown_active:
-                        self.e_key_down = True
-                        self.e_key_held_time = time.time()
-
-            elif event.type == pygame.KEYUP:
-                if event.key == pygame.K_e:
-                    self.e_key_down = False
-                    self.e_key_held_time = 0
-
-            self.player.handle_event(event)
-        
-        # Check if "E" key has been held for the required time
-        if self.e_key_down and (time.time() - self.e_key_held_time >= self.E_HOLD_TIME):
-            if not self.cooldown_active:
-                # Hide all wallPhantoms
-                for wallPhantom in self.wallPhantoms:
-                    wallPhantom.disappear()
-                # Start cooldown timer
-                self.cooldown_active = True
-                self.cooldown_timer = 0
-                self.e_key_down = False  # Reset the e_key_down flag
-                self.e_key_held_time = 0  # Reset the e_key_held_time
-
-
-
-    def teleport_player(self):
-        # Get player's current grid position
-        player_grid_x = self.player.position[0] // CELL_SIZE
-        player_grid_y = self.player.position[1] // CELL_SIZE
-
-        # Define directions for movement
-        directions = [(0, -1), (1, 0), (0, 1), (-1, 0)]  # Up, Right, Down, Left
-
-        # Randomly shuffle directions to randomize teleportation direction
-        random.shuffle(directions)
-
-        for distance in range(10, 21):  # Check distances from 10 to 20 cells away
-            for direction in directions:
-                dx, dy = direction
-                new_x = player_grid_x + dx * distance
-                new_y = player_grid_y + dy * distance
-
-                # Check if the new position is within the bounds of the grid
-                if 0 <= new_x < GRID_WIDTH and 0 <= new_y < GRID_HEIGHT:
-                    # Check if the new position is a passage/white cell
-                    if self.maze.grid[new_y][new_x] == 0:
-                        # Calculate the screen position of the new cell
-                        new_screen_x = new_x * CELL_SIZE
-                        new_screen_y = new_y * CELL_SIZE
-
-                        # Teleport the player to the new position
-                        self.player.position = [new_screen_x, new_screen_y]
-                        return  # Exit the method once a valid teleportation position is found
-
-        # If no suitable white cell found in the specified range, find the closest one
-        min_distance = float('inf')
-        closest_x, closest_y = None, None
-
-        for y in range(GRID_HEIGHT):
-            for x in range(GRID_WIDTH):
-                if self.maze.grid[y][x] == 0:  # Check if the cell is a white cell
-                    # Calculate the distance from the player
-                    distance = abs(x - player_grid_x) + abs(y - player_grid_y)
-                    if distance < min_distance:
-                        min_distance = distance
-                        closest_x, closest_y = x, y
-
-        # Teleport the player to the closest white cell found
-        if closest_x is not None and closest_y is not None:
-            new_screen_x = closest_x * CELL_SIZE
-            new_screen_y = closest_y * CELL_SIZE
-            self.player.position = [new_screen_x, new_screen_y]
-
-
-    def check_for_enemy_encounter(self):
-        for wallPhantom in self.wallPhantoms:
-            if wallPhantom.visible and wallPhantom.check_collision(self.player.position):
-                # Teleport the player after collision
-                #self.teleport_player()
-                # Handle jump scare and blackout effect
-                self.jumpscare_active = True
-                self.blackout_active = True
-                wallPhantom.disappear()
-                return True
-        return False
-
-
-    def init_enemies(self):
-        self.wallPhantoms = [WallPhantom() for _ in range(255)]
-
-    def reset(self, due_to_death=False):
-        if due_to_death:
-            self.level = 0
-        else:
-            self.level += 1
-
-        # Reset maze
-        self.maze = Maze()
-        
-        self.player.maze = self.maze  # Update player's maze reference
-        self.player.reset()
-
-        self.init_enemies()  # Reinitialize enemies
-        self.timer_running = True
-
-    def update_wallPhantoms(self):
-        # Skip wallPhantom spawning if cooldown is active
-        if not self.cooldown_active:
-            self.enemy_spawn_timer += 1
-
-            # Check if it's time to spawn a new wallPhantom
-            if self.enemy_spawn_timer >= self.enemy_spawn_interval:
-                self.enemy_spawn_timer = 0  # Reset the timer
-
-                # Loop through random positions to find a suitable spawn location
-                while True:
-                    random_x = random.randint(1, GRID_WIDTH - 2)  # Exclude walls
-                    random_y = random.randint(1, GRID_HEIGHT - 2)  # Exclude walls
-
-                    # Check if the position is in an open space (white cell), not on player's position, and not in walls
-                    if self.maze.grid[random_y][random_x] == 0 and (
-                            random_x, random_y) != (
-                            self.player.position[0] // CELL_SIZE, self.player.position[1] // CELL_SIZE):
-                        # Spawn wallPhantom at the open space
-                        for wallPhantom in self.wallPhantoms:
-                            if not wallPhantom.visible:
-                                wallPhantom.x = random_x
-                                wallPhantom.y = random_y
-                                wallPhantom.appear()
-                                break  # Spawned wallPhantom, exit loop
-                        break  # Exit while loop once wallPhantom is spawned
-
-        # Update cooldown timer
-        if self.cooldown_active:
-            self.cooldown_timer += 1
-            if self.cooldown_timer >= self.cooldown_duration * 30:  # Convert cooldown duration to frames (assuming 30 FPS)
-                self.cooldown_active = False  # Cooldown expired
-
-        # Check for collision with player and handle jump scare
-        for wallPhantom in self.wallPhantoms:
-            if wallPhantom.visible and wallPhantom.check_collision(self.player.position):
-                # Handle jump scare and blackout effect
-                self.jumpscare_active = True
-                self.blackout_active = True
-                wallPhantom.disappear()
-
-                # Teleport the player after collision
-                self.teleport_player()
-
-    def update_shake_factor(self):
-        if any(wallPhantom.visible for wallPhantom in self.wallPhantoms):
-            min_distance = min(
-                math.sqrt(
-                    (self.player.position[0] - wallPhantom.x * CELL_SIZE) ** 2 + (
-                                self.player.position[1] - wallPhantom.y * CELL_SIZE) ** 2)
-                for wallPhantom in self.wallPhantoms if wallPhantom.visible)
-        else:
-            min_distance = float('inf')
-
-        if min_distance != 0:  # Check if min_distance is not zero
-            self.shake_factor = min(0.5, 0.05 / min_distance)
-        else:
-            self.shake_factor = 0.5  # Default shake factor when min_distance is zero
-
-    def update_camera(self):
-        self.camera_x = max(0, min(self.player.position[0] // CELL_SIZE - SCREEN_WIDTH // (2 * CELL_SIZE),
-                                   GRID_WIDTH - SCREEN_WIDTH // CELL_SIZE))
-        self.camera_y = max(0, min(self.player.position[1] // CELL_SIZE - SCREEN_HEIGHT // (2 * CELL_SIZE),
-                                   GRID_HEIGHT - SCREEN_HEIGHT // CELL_SIZE))
-
-    def render(self):
-        self.base_surface.fill((0, 0, 0))
-
-        if not self.blackout_active:
-            
-            self.draw_grid(5)  # LINE OF SIGHT RADIUS
-            self.draw_player()
-            self.draw_arrow()
-            self.draw_death()
-            
-            
-            if self.player.reached_endpoint:
-                self.timer_running = False
-                self.base_surface.fill((0, 0, 0))
-                font = pygame.font.Font(None, 36)
-                text = font.render(f"Press Enter to move onto LVL{self.level + 1}" , True, (255, 255, 255))
-                text_rect = text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
-                self.base_surface.blit(text, text_rect)
-            
-            if self.jumpscare_active:
-                self.jumpscare_effect()
-            
-            if self.blackout_active:
-                self.blackout_effect()
-            
-            self.draw_timer()
-        
-        # Scale the base surface to the current screen resolution
-        scaled_surface = pygame.transform.scale(self.base_surface, self.screen.get_size())
-        self.screen.blit(scaled_surface, (0, 0))
-        
-        pygame.display.flip()
-
-    def draw_death(self):
-        x = self.death.position[0] * CELL_SIZE - self.camera_x * CELL_SIZE
-        y = self.death.position[1] * CELL_SIZE - self.camera_y * CELL_SIZE
-        pygame.draw.rect(self.base_surface, DEATH_COLOR, (x, y, CELL_SIZE, CELL_SIZE))
-
-    def draw_timer(self):
-        font = pygame.font.Font(None, 36)
-  
-        # Convert total time to hours, minutes, and seconds
-        hours = self.total_time // (30 * 60 * 60)  # 30 FPS, 60 seconds, 60 minutes
-        minutes = (self.total_time // (30 * 60)) % 60
-        seconds = (self.total_time // 30) % 60
-            
-        # Format the time as HH:MM:SS
-        time_text = font.render("{:02d}:{:02d}:{:02d}".format(hours, minutes, seconds), True, (255, 255, 255))
-        time_rect = time_text.get_rect()
-        
-        # Create a box for the timer
-        timer_box_width = time_rect.width + 20  # Add some padding
-        timer_box_height = time_rect.height + 10
-        timer_box_rect = pygame.Rect((SCREEN_WIDTH - timer_box_width) // 2 + 50, 30, timer_box_width, timer_box_height)
-        
-        # Draw timer box
-        pygame.draw.rect(self.base_surface, (0, 0, 0), timer_box_rect)
-        pygame.draw.rect(self.base_surface, (255, 255, 255), timer_box_rect, 2)
-        
-        # Position timer within the timer box
-        time_rect.centerx = timer_box_rect.centerx
-        time_rect.top = timer_box_rect.top + 5
-        
-        # Blit timer to the base surface
-        self.base_surface.blit(time_text, time_rect)
-        
-        # Create a box for the level counter
-        level_box_width = 120  # Adjust as needed
-        level_box_height = time_rect.height + 10
-        level_box_rect = pygame.Rect(timer_box_rect.left - level_box_width - 10, 30, level_box_width, level_box_height)
-        
-        # Draw level counter box
-        pygame.draw.rect(self.base_surface, (0, 0, 0), level_box_rect)
-        pygame.draw.rect(self.base_surface, (255, 255, 255), level_box_rect, 2)
-        
-        # Render level counter
-        font = pygame.font.Font(None, 36)
-        level_text = font.render("LVL {:03d}".format(self.level), True, (255, 255, 255))
-        level_rect = level_text.get_rect()
-        
-        # Position level counter within the level counter box
-        level_rect.centerx = level_box_rect.centerx
-        level_rect.top = level_box_rect.top + 5
-        
-        # Blit level counter to the base surface
-        self.base_surface.blit(level_text, level_rect)
-
-    def draw_grid(self, sight_radius):
-        player_grid_x = self.player.position[0] // CELL_SIZE
-        player_grid_y = self.player.position[1] // CELL_SIZE
-        endpoint_pos = self.maze.endpoint_pos
-
-        # Placeholder for endpoint position to draw it last
-        endpoint_to_draw = None
-
-        for y in range(SCREEN_HEIGHT // CELL_SIZE):
-            for x in range(SCREEN_WIDTH // CELL_SIZE):
-                grid_x = x + self.camera_x
-                grid_y = y + self.camera_y
-                distance = math.sqrt((grid_x - player_grid_x) ** 2 + (grid_y - player_grid_y) ** 2)
-
-                if 0 <= grid_x < GRID_WIDTH and 0 <= grid_y < GRID_HEIGHT and distance <= sight_radius:
-                    if (grid_x, grid_y) == endpoint_pos:
-                        endpoint_to_draw = (x, y)
-                    else:
-                        if self.maze.grid[grid_y][grid_x] == 1:
-                            color = (0, 0, 0)
-                        elif self.maze.grid[grid_y][grid_x] == 0:
-                            color = (255, 255, 255)
-                        pygame.draw.rect(self.base_surface, color, (x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE))
-
-        # Draw wall phantoms
-        for wallPhantom in self.wallPhantoms:
-            if wallPhantom.visible:
-                wx = wallPhantom.x * CELL_SIZE - self.camera_x * CELL_SIZE
-                wy = wallPhantom.y * CELL_SIZE - self.camera_y * CELL_SIZE
-                pulsate = (math.sin(time.time() * 5) + 1) * 0.5
-                color = (100 * pulsate, 0, 0)
-                pygame.draw.rect(self.base_surface, color, (wx, wy, CELL_SIZE, CELL_SIZE))
-
-        # Draw endpoint last
-        if endpoint_to_draw:
-            ex, ey = endpoint_to_draw
-            color = (0, 255, 0)  # Green color for endpoint
-            pygame.draw.rect(self.base_surface, color, (ex * CELL_SIZE, ey * CELL_SIZE, CELL_SIZE, CELL_SIZE))
-
-
-    def draw_player(self):
-        screen_x = self.player.position[0] - self.camera_x * CELL_SIZE
-        screen_y = self.player.position[1] - self.camera_y * CELL_SIZE
-        pygame.draw.rect(self.base_surface, (255, 0, 0), (screen_x, screen_y, CELL_SIZE, CELL_SIZE))
-
-    def draw_arrow(self):
-        dx = self.maze.endpoint_pos[0] * CELL_SIZE - self.player.position[0]
-        dy = self.maze.endpoint_pos[1] * CELL_SIZE - self.player.position[1]
-        angle = math.atan2(dy, dx)
-
-        max_distance = math.sqrt(GRID_WIDTH ** 2 + GRID_HEIGHT ** 2) * CELL_SIZE
-        nearby_enemies = [wallPhantom for wallPhantom in self.wallPhantoms if wallPhantom.visible and math.sqrt(
-            (self.player.position[0] - wallPhantom.x * CELL_SIZE) ** 2 + (
-                        self.player.position[1] - wallPhantom.y * CELL_SIZE) ** 2) <= 20 * CELL_SIZE]
-        spin_factor = sum(
-            max_distance - math.sqrt((self.player.position[0] - wallPhantom.x * CELL_SIZE) ** 2 + (
-                        self.player.position[1] - wallPhantom.y * CELL_SIZE) ** 2) for wallPhantom in
-            nearby_enemies) / 3
-        spin_speed = 0.005 * len(nearby_enemies)
-
-        if self.shake_factor > 0:
-            angle += self.shake_factor * math.sin(time.time() * 5)
-
-        angle += spin_factor * math.sin(time.time() * spin_speed)
-
-        x = self.player.position[0] - self.camera_x * CELL_SIZE + CELL_SIZE // 2
-        y = self.player.position[1] - self.camera_y * CELL_SIZE + CELL_SIZE // 2
-        length = CELL_SIZE // 2
-        target_x = x + length * math.cos(angle)
-        target_y = y + length * math.sin(angle)
-        pygame.draw.line(self.base_surface, (255, 255, 0), (x, y), (target_x, target_y), 3)
-        pygame.draw.polygon(self.base_surface, (255, 255, 0), ((target_x, target_y),
-                                                            (target_x - 8 * math.cos(angle + math.pi / 6),
-                                                                target_y - 8 * math.sin(angle + math.pi / 6)),
-                                                            (target_x - 8 * math.cos(angle - math.pi / 6),
-                                                                target_y - 8 * math.sin(angle - math.pi / 6))))
-
-    def jumpscare_effect(self):
-        pygame.mixer.music.stop()
-        self.jumpscare_sound.play()
-        # Instant red screen at the beginning
-        if self.jumpscare_timer < 30:  # Duration of instant red screen (1 second at 30 FPS)
-            alpha = 255
-        else:
-            # Smoothly fade out the red screen
-            alpha = max(0, 255 - int((self.jumpscare_timer - 30) * 255 / 60))  # Linear fade-out (2 seconds at 30 FPS)
-
-        jumpscare_surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-        jumpscare_surface.fill((255, 0, 0, alpha))
-        self.base_surface.blit(jumpscare_surface, (0, 0))
-        pygame.mixer.music.play(loops=-1)
-
-
-    def blackout_effect(self):
-        # Draw continuous blackout effect for 3 seconds after jumpscare
-        if self.blackout_active:
-            alpha = min(128, int(self.blackout_timer * 128 / 90))  # Linear fade-in (90 frames at 30 FPS)
-        else:
-            alpha = 0
-
-        blackout_surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-        blackout_surface.fill((0, 0, 0, alpha))
-        self.screen.blit(blackout_surface, (0, 0))
-
-        # Increment blackout timer
-        if self.blackout_active:
-            self.blackout_timer += 1
-
-        # Deactivate blackout effect after 3 seconds
-        if self.blackout_timer >= 90 and self.blackout_active:  # 3 seconds at 30 FPS
-            self.blackout_active = False
-            self.blackout_timer = 0
-
-if __name__ == "__main__":
-    Game().run()
+import pygame
+import pygame.mixer
+import argparse
+import csv
+import heapq
+import json
+import random
+import threading
+import time
+import math
+import os
+import struct
+from array import array
+from collections import OrderedDict, deque
+
+import numpy as np
+
+# Constants
+CELL_SIZE = 30
+GRID_WIDTH = 30  # Reduced grid width
+GRID_HEIGHT = 30  # Reduced grid height
+SCREEN_WIDTH = 800
+SCREEN_HEIGHT = 600
+PLAYER_SPEED = CELL_SIZE
+COOLDOWN_TIME = 0.1
+DEATH_COLOR = (255, 55, 55)
+DEATH_SCREEN_COLOR = (255, 0, 0)
+DEATH_SCREEN_TEXT_COLOR = (255, 255, 255)
+ARROW_LENGTH = CELL_SIZE // 2  # Pixels from the player's centre to the arrow tip
+ARROW_SHAKE_SPEED = 5  # Radians per second of the arrow's shake near phantoms
+FPS = 30  # Default frame rate, rendering can run at any rate
+TICK_RATE = 30  # Simulation ticks per second, fixed whatever the frame rate
+MAX_FRAME_TIME = 0.25  # Longest stretch of real time one frame catches up on, in seconds
+
+# Endless mode
+CHUNK_SIZE = 32  # Cells per chunk side, must be even
+CHUNK_CACHE_SIZE = 64  # Chunks kept in memory at most
+CHUNK_PREFETCH_MARGIN = 1  # Chunks generated around the camera view
+ENDLESS_EXIT_CHUNKS = 3  # Chunks between the start and the exit on level 1
+DEATH_FIELD_RADIUS = CHUNK_SIZE * 2  # Cells around the player Death can path through in endless mode
+
+# Level pipeline
+LEVEL_PREFETCH = 2  # Levels generated ahead of the one being played
+START_CELL = (1, 1)  # Where the player starts every level
+
+# Pre-rendered maze
+ATLAS_TILE_CELLS = 32  # Cells per atlas tile side
+ATLAS_CACHE_SIZE = 16  # Tiles kept in memory at most
+ATLAS_PALETTE = [(0, 0, 0), (255, 255, 255), (0, 255, 0)]  # Wall, floor, endpoint
+
+# Presentation
+PRESENT_MAX_RECTS = 64  # More dirty rects than this and the whole screen is updated
+
+# Text
+TEXT_CACHE_SIZE = 64  # Rendered text surfaces kept in memory at most
+TIMER_GLYPHS = "0123456789:"  # Characters in the timer's glyph atlas
+
+# Audio
+SFX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "SFX")  # Whatever the working directory
+SFX_CACHE_DIR = os.path.join(SFX_DIR, ".cache")  # Decoded sound effects from earlier runs
+SOUND_EFFECTS = {"jumpscare": "phantomJump1.mp3", "death": "phantomJump2.mp3"}  # One channel is reserved for each
+AMBIENCE = "ambience.mp3"
+AMBIENCE_VOLUME = 0.5
+DUCKED_VOLUME = 0.1  # Ambience volume while a sound effect plays
+
+# Frame pacing
+IDLE_FPS = 10  # Frame rate while nothing on screen is changing
+IDLE_DELAY = TICK_RATE  # Quiet ticks before the frame rate drops
+MENU_EVENT_TIMEOUT = 1000  # Longest a menu sleeps waiting for input, in milliseconds
+
+# Profiling
+PROFILE_FRAMES = 600  # Frames kept in the profiler's ring buffer
+PROFILE_OVERLAY_INTERVAL = 15  # Frames between refreshes of the profiler overlay
+PROFILE_STAGES = ["handle_events", "player.move", "update_wallPhantoms", "update_shake_factor", "render",
+                  "draw_grid", "draw_player", "draw_arrow", "draw_death", "draw_timer", "present", "pace", "frame"]
+
+# Line of sight
+FOV_CACHE_SIZE = 32  # Player cells whose field of view is kept
+
+# Octant transforms for shadowcasting
+FOV_OCTANTS = [(1, 0, 0, 1), (0, 1, 1, 0), (0, -1, 1, 0), (-1, 0, 0, 1),
+               (-1, 0, 0, -1), (0, -1, -1, 0), (0, 1, -1, 0), (1, 0, 0, -1)]
+
+
+# Directions for DFS
+DIRECTIONS = [(0, -1), (1, 0), (0, 1), (-1, 0)]  # Up, Right, Down, Left
+
+# Maze generation
+MAZE_ALGORITHM = "dfs"  # One of Maze.generators
+
+# Open cell index
+INDEX_REGION_SIZE = 16  # Cells per region side when open cells are bucketed by position
+DEATH_SPAWN_DISTANCE = 20  # Steps along the paths from the start Death spawns at least
+
+# Horde mode
+HORDE_SIZE = 200  # Hunters in every level
+HUNTER_STEP_TICKS = 15  # Ticks between hunter steps
+HUNTER_COLOR = (150, 30, 90)
+
+# Chance per tick that the headless bot picks a new direction
+BOT_TURN_CHANCE = 0.1
+
+# Random number streams, one per subsystem
+RNG_STREAMS = ["maze", "phantoms", "death", "teleport", "hunters"]
+
+# Input recordings
+REPLAY_MAGIC = b"OOTO"
+REPLAY_VERSION = 2  # Bumped whenever seeded play changes, older recordings would desync
+REPLAY_HEADER = struct.Struct("<4sBQB")  # Magic, version, seed, maze algorithm
+REPLAY_KEYS = [pygame.K_UP, pygame.K_DOWN, pygame.K_LEFT, pygame.K_RIGHT, pygame.K_e, pygame.K_RETURN]
+REPLAY_MODES = ["Normal", "Desperate", "Endless", "Horde"]
+REPLAY_KEY_UP = 0x40  # Flag on a key record, otherwise it is a key press
+REPLAY_START = 0x80  # Flag on a start_game record, the low bits are the mode
+REPLAY_END = 0xFF
+
+# Snapshots
+SNAPSHOT_MAGIC = b"OOTS"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct("<4sBB")  # Magic, version, game mode
+# Level, total time, deaths, levels completed, tick, next event sequence, flags, spawn ticks
+# left during a cooldown, jumpscare start, blackout start, E held since, phantom spawn interval
+SNAPSHOT_GAME = struct.Struct("<iqIIqqBiqqdi")
+SNAPSHOT_PLAYER = struct.Struct("<iiiid")  # Pixel position, direction, time of the last move
+SNAPSHOT_DEATH = struct.Struct("<iid?")  # Cell, move interval, moving
+SNAPSHOT_PIPELINE = struct.Struct("<QI")  # Level seed, next level index
+SNAPSHOT_RNG = struct.Struct("<625I?d")  # Mersenne Twister state and position, saved gauss
+SNAPSHOT_MAZE = struct.Struct("<BIIIIQB")  # Endless, width, height, exit x, exit y, endless seed, algorithm
+SNAPSHOT_FIELD = struct.Struct("<iiII")  # Death's distance field: padded window corner, width, height
+SNAPSHOT_COUNT = struct.Struct("<I")
+SNAPSHOT_CELL = np.dtype([("x", "<i4"), ("y", "<i4")])  # Phantom and hunter records
+SNAPSHOT_EVENT = np.dtype([("due", "<i8"), ("sequence", "<i8"), ("callback", "u1")])  # Scheduler records
+SNAPSHOT_ARRAY = np.dtype("<i4")  # Open cell index and distance field arrays
+AUTOSAVE_INTERVAL = 30  # Seconds of play between autosaves
+
+
+class Scheduler:
+    # Runs timed game events off one monotonic tick counter that the game loop advances
+    # once per frame. Events wait in a heap ordered by due tick, so a frame only touches
+    # the events that are due, however many entities have something scheduled.
+    def __init__(self, tick_rate=TICK_RATE):
+        self.tick = 0
+        self.tick_rate = tick_rate
+        self.events = []
+        self.sequence = 0  # Next event's number, keeps events due on the same tick in order
+
+    def time(self):
+        # Game time in seconds, so the scheduler can stand in for the time module
+        return self.tick / self.tick_rate
+
+    def ticks(self, seconds):
+        return max(1, round(seconds * self.tick_rate))
+
+    def schedule(self, delay, callback):
+        # Run callback once, delay ticks from now. Returns a handle for cancel()
+        event = [self.tick + delay, self.sequence, callback]
+        self.sequence += 1
+        heapq.heappush(self.events, event)
+        return event
+
+    def cancel(self, event):
+        if event is not None:
+            event[2] = None  # Dropped when it comes due
+
+    def remaining(self, event):
+        return max(0, event[0] - self.tick)
+
+    def advance(self):
+        self.tick += 1
+        while self.events and self.events[0][0] <= self.tick:
+            callback = heapq.heappop(self.events)[2]
+            if callback is not None:
+                callback()
+
+
+class RandomStreams:
+    # An independent Random for every subsystem in RNG_STREAMS, all derived from one seed,
+    # so one subsystem drawing more numbers (more phantoms, say) does not change what
+    # another one gets, and a seed plus the player's input reproduces a whole session
+    def __init__(self, seed=None):
+        self.seed = random.getrandbits(64) if seed is None else seed
+        for name in RNG_STREAMS:
+            setattr(self, name, random.Random(f"{self.seed}:{name}"))
+
+
+class Maze:
+    # Cells sit on odd coordinates with walls between them. Every algorithm in
+    # generators carves a perfect maze (exactly one path between any two cells) and
+    # only draws randomness from self.rng, so a seeded rng always gives the same maze.
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT, rng=None, algorithm=MAZE_ALGORITHM):
+        self.width = width
+        self.height = height
+        self.rng = rng or random
+        self.algorithm = algorithm
+        self.grid = self.init_grid(width, height)
+        self.endpoint_pos = self.generate_maze()
+        self.cells = None  # OpenCellIndex, built on first use
+
+    @classmethod
+    def from_grid(cls, grid, endpoint_pos, algorithm=MAZE_ALGORITHM):
+        # A maze that was generated before, as it was, without carving anything
+        maze = cls.__new__(cls)
+        maze.height, maze.width = grid.shape
+        maze.rng = random
+        maze.algorithm = algorithm
+        maze.grid = grid
+        maze.endpoint_pos = endpoint_pos
+        maze.dead_ends = None  # Only used to place the exit, which is already placed
+        maze.cells = None
+        return maze
+
+    @staticmethod
+    def init_grid(width=GRID_WIDTH, height=GRID_HEIGHT):
+        # 1 = wall, 0 = open space, one byte per cell
+        grid = np.ones((height, width), dtype=np.uint8)
+        grid[1::2, 1::2] = 0  # Open space
+        return grid
+
+    def carve_passages_from(self, cx, cy):
+        width, height = self.width, self.height
+        grid = self.grid
+        stack = [(cx, cy)]
+        visited = bytearray(width * height)
+        visited[cy * width + cx] = 1
+
+        while stack:
+            (cx, cy) = stack[-1]
+            directions = DIRECTIONS[:]
+            self.rng.shuffle(directions)
+            carved = False
+
+            for direction in directions:
+                nx, ny = cx + direction[0] * 2, cy + direction[1] * 2
+                if 0 <= nx < width and 0 <= ny < height and not visited[ny * width + nx] and grid[ny, nx] == 0:
+                    wall_x, wall_y = cx + direction[0], cy + direction[1]
+                    grid[wall_y, wall_x] = 0  # Remove the wall
+                    grid[ny, nx] = 0
+                    stack.append((nx, ny))
+                    visited[ny * width + nx] = 1
+                    carved = True
+                    break
+
+            if not carved:
+                stack.pop()
+
+    def carve_dfs(self):
+        self.carve_passages_from(1, 1)
+
+    def carve_kruskal(self):
+        # Randomized Kruskal: go through the walls between cells in random order and
+        # remove each one whose two cells are not connected yet, tracked with a union-find
+        cols, rows = self.width // 2, self.height // 2
+        ys, xs = np.mgrid[0:rows, 0:cols]
+        cells = ys * cols + xs
+        first = np.concatenate((cells[:, :-1].ravel(), cells[:-1, :].ravel()))
+        second = np.concatenate((cells[:, 1:].ravel(), cells[1:, :].ravel()))
+        wall_x = np.concatenate((2 * xs[:, :-1].ravel() + 2, 2 * xs[:-1, :].ravel() + 1))
+        wall_y = np.concatenate((2 * ys[:, :-1].ravel() + 1, 2 * ys[:-1, :].ravel() + 2))
+        order = np.random.default_rng(self.rng.getrandbits(64)).permutation(len(first))
+
+        grid = self.grid
+        parent = array('i', range(cols * rows))
+        remaining = cols * rows - 1
+        for a, b, x, y in zip(first[order].tolist(), second[order].tolist(),
+                              wall_x[order].tolist(), wall_y[order].tolist()):
+            while parent[a] != a:
+                parent[a] = a = parent[parent[a]]  # Path halving
+            while parent[b] != b:
+                parent[b] = b = parent[parent[b]]
+            if a != b:
+                parent[a] = b
+                grid[y, x] = 0
+                remaining -= 1
+                if not remaining:
+                    break
+
+    def carve_wilson(self):
+        # Wilson's algorithm: from every cell not in the maze yet, random walk until the
+        # walk hits the maze, then carve the walk with its loops erased. Every perfect
+        # maze is equally likely, unlike DFS which favours long corridors.
+        cols, rows = self.width // 2, self.height // 2
+        grid = self.grid
+        rng = self.rng
+        in_maze = bytearray(cols * rows)
+        in_maze[rng.randrange(cols * rows)] = 1
+        heading = bytearray(cols * rows)  # Direction the walk last left each cell in, which erases loops
+
+        for start in range(cols * rows):
+            cell = start
+            while not in_maze[cell]:
+                x, y = cell % cols, cell // cols
+                while True:
+                    direction = rng.getrandbits(2)
+                    dx, dy = DIRECTIONS[direction]
+                    if 0 <= x + dx < cols and 0 <= y + dy < rows:
+                        break
+                heading[cell] = direction
+                cell += dy * cols + dx
+
+            cell = start
+            while not in_maze[cell]:
+                in_maze[cell] = 1
+                x, y = cell % cols, cell // cols
+                dx, dy = DIRECTIONS[heading[cell]]
+                grid[2 * y + 1 + dy, 2 * x + 1 + dx] = 0
+                cell += dy * cols + dx
+
+    @staticmethod
+    def eller_rows(width, height, rng):
+        # Eller's algorithm, yielding the grid one row at a time. Only the set of each cell
+        # in the current row is kept, so a maze of any height streams in O(width) memory.
+        cols, rows = width // 2, height // 2
+        wall = np.ones(width, dtype=np.uint8)
+        yield wall
+        sets = list(range(cols))
+        for j in range(rows):
+            last = j == rows - 1
+            row = wall.copy()
+            row[1:2 * cols:2] = 0
+
+            # Join neighbours in different sets at random, all of them on the last row
+            parent = list(range(cols))
+            for i in range(cols - 1):
+                a, b = sets[i], sets[i + 1]
+                while parent[a] != a:
+                    parent[a] = a = parent[parent[a]]
+                while parent[b] != b:
+                    parent[b] = b = parent[parent[b]]
+                if a != b and (last or rng.getrandbits(1)):
+                    parent[b] = a
+                    row[2 * i + 2] = 0
+            for i in range(cols):
+                a = sets[i]
+                while parent[a] != a:
+                    a = parent[a]
+                sets[i] = a
+            yield row
+            if last:
+                break
+
+            # Every set continues down through one or more cells, the other cells start
+            # new sets. Labels are renumbered to stay below cols.
+            members = {}
+            for i, label in enumerate(sets):
+                members.setdefault(label, []).append(i)
+            below = wall.copy()
+            next_sets = [-1] * cols
+            for label, cells in enumerate(members.values()):
+                down = rng.choice(cells)
+                for i in cells:
+                    if i == down or rng.getrandbits(1):
+                        below[2 * i + 1] = 0
+                        next_sets[i] = label
+            label = len(members)
+            for i in range(cols):
+                if next_sets[i] < 0:
+                    next_sets[i] = label
+                    label += 1
+            sets = next_sets
+            yield below
+
+        if height % 2:
+            yield wall
+
+    def carve_eller(self):
+        for y, row in enumerate(self.eller_rows(self.width, self.height, self.rng)):
+            self.grid[y] = row
+
+    generators = {"dfs": carve_dfs, "kruskal": carve_kruskal, "wilson": carve_wilson, "eller": carve_eller}
+
+    def open_neighbour_counts(self):
+        # Number of open orthogonal neighbours for every interior cell
+        open_cells = self.grid == 0
+        counts = np.zeros((self.height - 2, self.width - 2), dtype=np.uint8)
+        for dx, dy in DIRECTIONS:
+            counts += open_cells[1 + dy:self.height - 1 + dy, 1 + dx:self.width - 1 + dx]
+        return counts
+
+    def find_dead_ends(self):
+        # (x, y) pairs of all interior open cells with exactly one open neighbour
+        interior_open = self.grid[1:-1, 1:-1] == 0
+        ys, xs = np.nonzero(interior_open & (self.open_neighbour_counts() == 1))
+        return np.column_stack((xs + 1, ys + 1))
+
+    def generate_maze(self):
+        start_x, start_y = 1, 1  # Start in the first open cell
+        self.generators[self.algorithm](self)
+
+        # Find all the dead ends in the maze
+        self.dead_ends = self.find_dead_ends()
+
+        # Choose a random dead end to place the exit
+        far_enough = (np.abs(self.dead_ends[:, 0] - start_x) > 2) | (np.abs(self.dead_ends[:, 1] - start_y) > 2)
+        candidates = self.dead_ends[far_enough]
+        if len(candidates):
+            x, y = candidates[self.rng.randrange(len(candidates))]
+        else:
+            # If no suitable dead end is found, choose a random open space
+            ys, xs = np.nonzero(self.grid[1:-1, 1:-1] == 0)
+            i = self.rng.randrange(len(xs))
+            x, y = xs[i] + 1, ys[i] + 1
+        exit_pos = (int(x), int(y))
+
+        # Set exit in the grid
+        self.grid[exit_pos[1], exit_pos[0]] = 0
+        return exit_pos
+
+    def is_open(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height and self.grid[y, x] == 0
+
+    def window(self, x0, y0, x1, y1):
+        # Copy of grid[y0:y1, x0:x1], cells outside the maze read as walls
+        window = np.ones((y1 - y0, x1 - x0), dtype=np.uint8)
+        cx0, cy0 = max(x0, 0), max(y0, 0)
+        cx1, cy1 = min(x1, self.width), min(y1, self.height)
+        if cx0 < cx1 and cy0 < cy1:
+            window[cy0 - y0:cy1 - y0, cx0 - x0:cx1 - x0] = self.grid[cy0:cy1, cx0:cx1]
+        return window
+
+    def open_cells(self):
+        if self.cells is None:
+            self.cells = OpenCellIndex(self)
+        return self.cells
+
+    def random_open(self, rng, x, y):
+        # Random open cell other than (x, y)
+        return self.open_cells().random(rng, exclude=(x, y))
+
+    def nearest_open(self, x, y):
+        return self.open_cells().nearest(x, y)
+
+    def prefetch(self, x0, y0, x1, y1):
+        pass
+
+
+class EndlessMaze:
+    # Unbounded maze to the right and down, built from CHUNK_SIZE x CHUNK_SIZE chunks.
+    # Each chunk is generated from the seed and its chunk coordinates only, so an
+    # evicted chunk comes back identical. A chunk owns its west and north walls and
+    # opens one door in each, which connects it to the chunks on those sides.
+    width = math.inf
+    height = math.inf
+
+    def __init__(self, seed, level=1):
+        self.seed = seed
+        self.chunks = OrderedDict()
+        self.chunks_generated = 0
+
+        # Place the exit on a dead end a few chunks away, further for every level
+        rng = random.Random(f"{seed}:exit")
+        distance = ENDLESS_EXIT_CHUNKS + level - 1
+        exit_cx = rng.randint(0, distance)
+        exit_cy = distance - exit_cx
+        ex, ey = self.carve_chunk(exit_cx, exit_cy).endpoint_pos
+        self.endpoint_pos = (exit_cx * CHUNK_SIZE + ex, exit_cy * CHUNK_SIZE + ey)
+
+    def carve_chunk(self, cx, cy):
+        rng = random.Random(f"{self.seed}:{cx}:{cy}")
+        # One extra row and column so the chunk is a closed odd sized maze, then cut
+        # them off; they belong to the neighbours as their west and north walls
+        return Maze(CHUNK_SIZE + 1, CHUNK_SIZE + 1, rng=rng)
+
+    def generate_chunk(self, cx, cy):
+        maze = self.carve_chunk(cx, cy)
+        chunk = maze.grid[:CHUNK_SIZE, :CHUNK_SIZE].copy()
+        if cx > 0:
+            chunk[1 + 2 * maze.rng.randrange(CHUNK_SIZE // 2), 0] = 0  # West door
+        if cy > 0:
+            chunk[0, 1 + 2 * maze.rng.randrange(CHUNK_SIZE // 2)] = 0  # North door
+        self.chunks_generated += 1
+        return chunk
+
+    def chunk(self, cx, cy):
+        key = (cx, cy)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            chunk = self.generate_chunk(cx, cy)
+            self.chunks[key] = chunk
+            if len(self.chunks) > CHUNK_CACHE_SIZE:
+                self.chunks.popitem(last=False)  # Evict the least recently used chunk
+        else:
+            self.chunks.move_to_end(key)
+        return chunk
+
+    def is_open(self, x, y):
+        if x < 0 or y < 0:
+            return False
+        cx, lx = divmod(x, CHUNK_SIZE)
+        cy, ly = divmod(y, CHUNK_SIZE)
+        return self.chunk(cx, cy)[ly, lx] == 0
+
+    def window(self, x0, y0, x1, y1):
+        window = np.ones((y1 - y0, x1 - x0), dtype=np.uint8)
+        for cy in range(max(y0, 0) // CHUNK_SIZE, (max(y1, 1) - 1) // CHUNK_SIZE + 1):
+            for cx in range(max(x0, 0) // CHUNK_SIZE, (max(x1, 1) - 1) // CHUNK_SIZE + 1):
+                ox, oy = cx * CHUNK_SIZE, cy * CHUNK_SIZE
+                sx0, sy0 = max(x0, ox), max(y0, oy)
+                sx1, sy1 = min(x1, ox + CHUNK_SIZE), min(y1, oy + CHUNK_SIZE)
+                if sx0 < sx1 and sy0 < sy1:
+                    window[sy0 - y0:sy1 - y0, sx0 - x0:sx1 - x0] = self.chunk(cx, cy)[sy0 - oy:sy1 - oy, sx0 - ox:sx1 - ox]
+        return window
+
+    def open_cells(self):
+        return None  # Unbounded, there is no index to build
+
+    def random_open(self, rng, x, y):
+        # Random open cell within two chunks of (x, y) other than (x, y). Every chunk is
+        # about half open, so this takes a couple of tries whatever the distance travelled.
+        margin = CHUNK_SIZE * 2
+        while True:
+            random_x = rng.randint(max(1, x - margin), x + margin)
+            random_y = rng.randint(max(1, y - margin), y + margin)
+            if self.is_open(random_x, random_y) and (random_x, random_y) != (x, y):
+                return random_x, random_y
+
+    def nearest_open(self, x, y, radius=20):
+        # Closest open cell by Manhattan distance within radius of (x, y), or None
+        ys, xs = np.nonzero(self.window(x - radius, y - radius, x + radius + 1, y + radius + 1) == 0)
+        if not len(xs):
+            return None
+        xs += x - radius
+        ys += y - radius
+        i = np.argmin(np.abs(xs - x) + np.abs(ys - y))
+        return int(xs[i]), int(ys[i])
+
+    def prefetch(self, x0, y0, x1, y1):
+        # Generate the chunks the camera is about to see
+        margin = CHUNK_PREFETCH_MARGIN
+        for cy in range(max(0, y0 // CHUNK_SIZE - margin), y1 // CHUNK_SIZE + margin + 1):
+            for cx in range(max(0, x0 // CHUNK_SIZE - margin), x1 // CHUNK_SIZE + margin + 1):
+                self.chunk(cx, cy)
+
+class OpenCellIndex:
+    # Every open cell of a finite maze, numbered in row order, for spawns and lookups
+    # that would otherwise sample until they hit an open cell or scan the grid. The
+    # numbers are bucketed by INDEX_REGION_SIZE square regions for nearest cell queries,
+    # and sorted by path distance from the start and from the exit so "at least n steps
+    # away" is one binary search and one random pick.
+    def __init__(self, maze):
+        self.number(maze)
+        self.by_region = np.argsort(self.regions(), kind="stable").astype(np.int32)
+        self.from_start = self.path_distances(*START_CELL)
+        self.from_exit = self.path_distances(*maze.endpoint_pos)
+        self.by_start = np.argsort(self.from_start, kind="stable").astype(np.int32)
+        self.by_exit = np.argsort(self.from_exit, kind="stable").astype(np.int32)
+        self.sort()
+
+    @classmethod
+    def from_arrays(cls, maze, arrays):
+        # The index of maze rebuilt from arrays() of the same maze, with no search or sort
+        index = cls.__new__(cls)
+        index.number(maze)
+        index.by_region, index.from_start, index.from_exit, index.by_start, index.by_exit = arrays
+        index.sort()
+        return index
+
+    def arrays(self):
+        # The int32 arrays, one entry per open cell, that take searching or sorting to build
+        return [self.by_region, self.from_start, self.from_exit, self.by_start, self.by_exit]
+
+    def number(self, maze):
+        ys, xs = np.nonzero(maze.grid == 0)
+        self.xs = xs.astype(np.int32)
+        self.ys = ys.astype(np.int32)
+        self.count = len(xs)
+        self.numbers = np.full(maze.grid.shape, -1, dtype=np.int32)
+        self.numbers[ys, xs] = np.arange(self.count, dtype=np.int32)
+        self.regions_x = -(-maze.width // INDEX_REGION_SIZE)
+        self.regions_y = -(-maze.height // INDEX_REGION_SIZE)
+
+    def regions(self):
+        return (self.ys // INDEX_REGION_SIZE) * self.regions_x + self.xs // INDEX_REGION_SIZE
+
+    def sort(self):
+        # Region r holds by_region[region_starts[r]:region_starts[r + 1]]
+        self.region_starts = np.searchsorted(self.regions()[self.by_region],
+                                             np.arange(self.regions_x * self.regions_y + 1))
+        self.sorted_from_start = self.from_start[self.by_start]
+        self.sorted_from_exit = self.from_exit[self.by_exit]
+
+    def cell(self, i):
+        return int(self.xs[i]), int(self.ys[i])
+
+    def path_distances(self, x, y):
+        # Steps from (x, y) to every open cell, breadth first over the flattened grid
+        height, width = self.numbers.shape
+        numbers = self.numbers.ravel().tolist()
+        size = width * height
+        distances = [-1] * self.count
+        root = y * width + x
+        distances[numbers[root]] = 0
+        queue = deque([root])
+        while queue:
+            p = queue.popleft()
+            d = distances[numbers[p]] + 1
+            for q in (p - width, p + 1, p + width, p - 1):
+                # Sideways steps never wrap onto a cell, column 0 is always wall
+                if 0 <= q < size and numbers[q] >= 0 and distances[numbers[q]] < 0:
+                    distances[numbers[q]] = d
+                    queue.append(q)
+        return np.array(distances, dtype=np.int32)
+
+    def random(self, rng, exclude=None):
+        # Uniformly random open cell, never exclude
+        skip = self.numbers[exclude[1], exclude[0]] if exclude is not None else -1
+        if skip < 0 or self.count < 2:
+            return self.cell(rng.randrange(self.count))
+        i = rng.randrange(self.count - 1)
+        return self.cell(i + (i >= skip))
+
+    def away(self, distance, from_exit=False):
+        # Cell numbers ordered by distance from the start (or the exit), and where the
+        # ones at least distance steps away begin; the furthest if none are that far
+        order = self.by_exit if from_exit else self.by_start
+        distances = self.sorted_from_exit if from_exit else self.sorted_from_start
+        return order, int(np.searchsorted(distances, distances.dtype.type(min(distance, distances[-1]))))
+
+    def random_away(self, rng, distance, from_exit=False):
+        # Uniformly random open cell at least distance steps from the start (or the exit)
+        order, first = self.away(distance, from_exit)
+        return self.cell(order[first + rng.randrange(self.count - first)])
+
+    def sample_away(self, generator, distance, count, from_exit=False):
+        # count picks like random_away at once from a numpy Generator, as x and y arrays
+        order, first = self.away(distance, from_exit)
+        picks = order[first + generator.integers(self.count - first, size=count)]
+        return self.xs[picks], self.ys[picks]
+
+    def nearest(self, x, y):
+        # Closest open cell by Manhattan distance, searching rings of regions outwards
+        # until no unsearched region can hold anything closer
+        if 0 <= x < self.numbers.shape[1] and 0 <= y < self.numbers.shape[0] and self.numbers[y, x] >= 0:
+            return x, y
+        rx, ry = x // INDEX_REGION_SIZE, y // INDEX_REGION_SIZE
+        best, best_distance = None, math.inf
+        rings = max(abs(rx), abs(self.regions_x - 1 - rx), abs(ry), abs(self.regions_y - 1 - ry)) + 1
+        for ring in range(rings):
+            if best_distance <= (ring - 1) * INDEX_REGION_SIZE:
+                break
+            for ry1 in range(ry - ring, ry + ring + 1):
+                if not 0 <= ry1 < self.regions_y:
+                    continue
+                step = 1 if abs(ry1 - ry) == ring else 2 * ring
+                for rx1 in range(rx - ring, rx + ring + 1, step):
+                    if not 0 <= rx1 < self.regions_x:
+                        continue
+                    region = ry1 * self.regions_x + rx1
+                    members = self.by_region[self.region_starts[region]:self.region_starts[region + 1]]
+                    if not len(members):
+                        continue
+                    distances = np.abs(self.xs[members] - x) + np.abs(self.ys[members] - y)
+                    i = np.argmin(distances)
+                    if distances[i] < best_distance:
+                        best, best_distance = members[i], distances[i]
+        return None if best is None else self.cell(best)
+
+
+class DistanceField:
+    # Distance to the player over the open cells of a window of the maze, for Death.
+    # The open cells are rooted once as a spanning tree, numbered in depth first order
+    # so every subtree is one interval [tin, tout). Generated mazes are perfect, so the
+    # tree is the maze itself and tree distance is path distance. When the player moves
+    # the field needs no search at all: the neighbour one step down the distance
+    # gradient is the child whose interval holds the player's cell if the player is
+    # below the current cell, else the parent, which is O(1) per step.
+    def __init__(self, maze, root, x0=0, y0=0, x1=None, y1=None):
+        x1 = maze.width if x1 is None else x1
+        y1 = maze.height if y1 is None else y1
+        # One cell of wall padding so neighbours of window cells never leave the arrays
+        self.x0, self.y0 = x0 - 1, y0 - 1
+        self.width = x1 - x0 + 2
+        self.height = y1 - y0 + 2
+        grid = maze.window(self.x0, self.y0, self.x0 + self.width, self.y0 + self.height)
+        grid[[0, -1], :] = 1
+        grid[:, [0, -1]] = 1
+        open_cells = (grid.ravel() == 0).tobytes()
+
+        size = self.width * self.height
+        self.offsets = (-self.width, 1, self.width, -1)
+        self.parent = array('i', [-1]) * size
+        self.tin = array('i', [-1]) * size
+        self.tout = array('i', [-1]) * size
+
+        root_index = self.index(*root)
+        if root_index is None or not open_cells[root_index]:
+            return
+
+        # Iterative depth first numbering, a cell's subtree is popped right after it
+        parent, tin = self.parent, self.tin
+        order = array('i')
+        visited = bytearray(size)
+        visited[root_index] = 1
+        stack = [root_index]
+        while stack:
+            i = stack.pop()
+            tin[i] = len(order)
+            order.append(i)
+            for offset in self.offsets:
+                j = i + offset
+                if open_cells[j] and not visited[j]:
+                    visited[j] = 1
+                    parent[j] = i
+                    stack.append(j)
+
+        # Subtree sizes give the end of every interval
+        subtree = array('i', [1]) * size
+        for i in reversed(order[1:]):
+            subtree[parent[i]] += subtree[i]
+        tout = self.tout
+        for i in order:
+            tout[i] = tin[i] + subtree[i]
+
+    @classmethod
+    def from_arrays(cls, x0, y0, width, height, parent, tin, tout):
+        # A field rebuilt from its padded window and the arrays of the one saved
+        field = cls.__new__(cls)
+        field.x0, field.y0 = x0, y0
+        field.width, field.height = width, height
+        field.offsets = (-width, 1, width, -1)
+        field.parent, field.tin, field.tout = parent, tin, tout
+        return field
+
+    def index(self, x, y):
+        x -= self.x0
+        y -= self.y0
+        if 0 < x < self.width - 1 and 0 < y < self.height - 1:
+            return y * self.width + x
+        return None
+
+    def contains(self, x, y, margin=0):
+        x -= self.x0
+        y -= self.y0
+        return margin < x < self.width - 1 - margin and margin < y < self.height - 1 - margin
+
+    def next_step(self, position, target):
+        # Neighbour of position one cell closer to target, None if either is not in the tree
+        i = self.index(*position)
+        t = self.index(*target)
+        if i is None or t is None or self.tin[i] < 0 or self.tin[t] < 0:
+            return None
+        if i == t:
+            return position
+
+        tin_t = self.tin[t]
+        if self.tin[i] <= tin_t < self.tout[i]:
+            # Target is below us, go down into the child subtree that holds it
+            for offset in self.offsets:
+                j = i + offset
+                if self.parent[j] == i and self.tin[j] <= tin_t < self.tout[j]:
+                    break
+        else:
+            j = self.parent[i]
+        return j % self.width + self.x0, j // self.width + self.y0
+
+    def flow(self, target):
+        # Next cell towards target from every cell of the tree at once, for moving many
+        # pursuers together: the parent, except on the path from the target up to the
+        # root where it is the child towards the target. -1 off the tree, None if the
+        # target is not in it.
+        t = self.index(*target)
+        if t is None or self.tin[t] < 0:
+            return None
+        step = np.frombuffer(self.parent, dtype=np.int32).copy()
+        step[t] = t
+        parent = self.parent
+        while parent[t] >= 0:
+            step[parent[t]] = t
+            t = parent[t]
+        return step
+
+
+class MazeAtlas:
+    # The maze drawn once into 8-bit tile surfaces of ATLAS_TILE_CELLS cells, so a frame
+    # blits the visible part instead of drawing every cell. Mazes that fit in the cache
+    # are rendered up front, bigger and endless ones tile by tile as the camera reaches
+    # them, with the least recently used tiles dropped.
+    def __init__(self, maze):
+        self.maze = maze
+        self.tiles = OrderedDict()
+        if math.isinf(maze.width):
+            return
+        tiles_x = math.ceil(maze.width / ATLAS_TILE_CELLS)
+        tiles_y = math.ceil(maze.height / ATLAS_TILE_CELLS)
+        if tiles_x * tiles_y <= ATLAS_CACHE_SIZE:
+            for ty in range(tiles_y):
+                for tx in range(tiles_x):
+                    self.tile(tx, ty)
+
+    def render_tile(self, tx, ty):
+        x0, y0 = tx * ATLAS_TILE_CELLS, ty * ATLAS_TILE_CELLS
+        cells = (self.maze.window(x0, y0, x0 + ATLAS_TILE_CELLS, y0 + ATLAS_TILE_CELLS) == 0).astype(np.uint8)
+        ex, ey = self.maze.endpoint_pos
+        if x0 <= ex < x0 + ATLAS_TILE_CELLS and y0 <= ey < y0 + ATLAS_TILE_CELLS:
+            cells[ey - y0, ex - x0] = 2
+
+        pixels = np.repeat(np.repeat(cells, CELL_SIZE, axis=0), CELL_SIZE, axis=1)
+        tile = pygame.Surface((ATLAS_TILE_CELLS * CELL_SIZE, ATLAS_TILE_CELLS * CELL_SIZE), depth=8)
+        tile.set_palette(ATLAS_PALETTE)
+        pygame.surfarray.blit_array(tile, pixels.T)
+        return tile
+
+    def tile(self, tx, ty):
+        key = (tx, ty)
+        tile = self.tiles.get(key)
+        if tile is None:
+            tile = self.render_tile(tx, ty)
+            self.tiles[key] = tile
+            if len(self.tiles) > ATLAS_CACHE_SIZE:
+                self.tiles.popitem(last=False)
+        else:
+            self.tiles.move_to_end(key)
+        return tile
+
+    def invalidate(self):
+        self.tiles.clear()
+
+    def draw(self, surface, x0, y0, x1, y1, view_x, view_y):
+        # Blit the cells [x0, x1) x [y0, y1) to where a camera at pixel (view_x, view_y) puts them
+        for ty in range(y0 // ATLAS_TILE_CELLS, (y1 - 1) // ATLAS_TILE_CELLS + 1):
+            for tx in range(x0 // ATLAS_TILE_CELLS, (x1 - 1) // ATLAS_TILE_CELLS + 1):
+                ox, oy = tx * ATLAS_TILE_CELLS, ty * ATLAS_TILE_CELLS
+                cx0, cy0 = max(x0, ox), max(y0, oy)
+                cx1, cy1 = min(x1, ox + ATLAS_TILE_CELLS), min(y1, oy + ATLAS_TILE_CELLS)
+                area = pygame.Rect((cx0 - ox) * CELL_SIZE, (cy0 - oy) * CELL_SIZE,
+                                   (cx1 - cx0) * CELL_SIZE, (cy1 - cy0) * CELL_SIZE)
+                surface.blit(self.tile(tx, ty), (cx0 * CELL_SIZE - view_x, cy0 * CELL_SIZE - view_y), area)
+
+
+class FieldOfView:
+    # What the player can see from a cell: recursive shadowcasting over the maze, cut off
+    # at the sight radius. Results are kept per player cell in an LRU together with the
+    # mask surface that hides everything else, so standing still or walking back to a
+    # recent cell is a dict lookup.
+    def __init__(self, maze):
+        self.maze = maze
+        self.cache = OrderedDict()
+
+    def compute(self, x, y, radius):
+        # Boolean (2r+1, 2r+1) array of visible cells centred on (x, y)
+        size = 2 * radius + 1
+        walls = self.maze.window(x - radius, y - radius, x + radius + 1, y + radius + 1) == 1
+        visible = np.zeros((size, size), dtype=bool)
+        visible[radius, radius] = True
+        for xx, xy, yx, yy in FOV_OCTANTS:
+            self.cast_light(walls, visible, radius, 1, 1.0, 0.0, xx, xy, yx, yy)
+        return visible
+
+    def cast_light(self, walls, visible, radius, row, start, end, xx, xy, yx, yy):
+        # Scan one octant row by row, recursing past every wall that starts a shadow
+        if start < end:
+            return
+        radius_squared = radius * radius
+        new_start = start
+        for distance in range(row, radius + 1):
+            dx, dy = -distance - 1, -distance
+            blocked = False
+            while dx <= 0:
+                dx += 1
+                left_slope = (dx - 0.5) / (dy + 0.5)
+                right_slope = (dx + 0.5) / (dy - 0.5)
+                if start < right_slope:
+                    continue
+                if end > left_slope:
+                    break
+
+                cx = radius + dx * xx + dy * xy
+                cy = radius + dx * yx + dy * yy
+                if dx * dx + dy * dy <= radius_squared:
+                    visible[cy, cx] = True
+                if blocked:
+                    if walls[cy, cx]:
+                        new_start = right_slope
+                    else:
+                        blocked = False
+                        start = new_start
+                elif walls[cy, cx] and distance < radius:
+                    blocked = True
+                    self.cast_light(walls, visible, radius, distance + 1, start, left_slope, xx, xy, yx, yy)
+                    new_start = right_slope
+            if blocked:
+                break
+
+    def get(self, x, y, radius):
+        # (visible array, mask surface) for the player standing on (x, y)
+        key = (x, y, radius)
+        entry = self.cache.get(key)
+        if entry is None:
+            visible = self.compute(x, y, radius)
+            size = (2 * radius + 1) * CELL_SIZE
+            mask = pygame.Surface((size, size), pygame.SRCALPHA)
+            mask.fill((0, 0, 0, 255))
+            alpha = pygame.surfarray.pixels_alpha(mask)
+            alpha[:] = np.repeat(np.repeat(np.where(visible, 0, 255).astype(np.uint8), CELL_SIZE, axis=0),
+                                 CELL_SIZE, axis=1).T
+            del alpha  # Unlock the surface
+            entry = (visible, mask)
+            self.cache[key] = entry
+            if len(self.cache) > FOV_CACHE_SIZE:
+                self.cache.popitem(last=False)
+        else:
+            self.cache.move_to_end(key)
+        return entry
+
+
+class Level:
+    # A finished maze with everything derived from it that a level needs before play
+    def __init__(self, index, maze, atlas, field):
+        self.index = index
+        self.maze = maze
+        self.atlas = atlas
+        self.field = field
+
+
+class LevelPipeline:
+    # Builds the next levels on a worker thread while the current one is played: the
+    # maze with its dead ends, exit and open cell index, the atlas, and Death's
+    # distance field (any root works in a perfect maze, so it is built from the start
+    # cell). Level n always comes from Random(f"{seed}:{n}"), so the levels are the same
+    # whether one was waiting in the queue or had to be built on the spot because the
+    # worker was behind.
+    def __init__(self, seed, headless=False, capacity=LEVEL_PREFETCH, algorithm=MAZE_ALGORITHM, first_index=0):
+        self.seed = seed
+        self.headless = headless
+        self.algorithm = algorithm
+        self.capacity = capacity
+        self.levels = deque()
+        self.next_index = first_index  # Next level handed to the game
+        self.build_index = first_index  # Next level the worker builds
+        self.running = True
+        self.condition = threading.Condition()
+        self.counters = {"prefetched": 0, "synchronous": 0}
+        self.worker = None  # With no capacity every level is built on the spot
+        if capacity:
+            self.worker = threading.Thread(target=self.work, daemon=True)
+            self.worker.start()
+
+    def build(self, index):
+        maze = Maze(rng=random.Random(f"{self.seed}:{index}"), algorithm=self.algorithm)
+        maze.open_cells()
+        atlas = None if self.headless else MazeAtlas(maze)
+        return Level(index, maze, atlas, DistanceField(maze, START_CELL))
+
+    def work(self):
+        while True:
+            with self.condition:
+                while self.running and len(self.levels) >= self.capacity:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                index = self.build_index
+                self.build_index += 1
+            level = self.build(index)
+            with self.condition:
+                if index >= self.next_index:  # Otherwise it was already built on the spot
+                    self.levels.append(level)
+
+    def next(self):
+        with self.condition:
+            index = self.next_index
+            self.next_index += 1
+            while self.levels and self.levels[0].index < index:
+                self.levels.popleft()
+            if self.levels and self.levels[0].index == index:
+                self.counters["prefetched"] += 1
+                self.condition.notify()
+                return self.levels.popleft()
+            # The worker is behind, skip it past this level
+            self.build_index = max(self.build_index, index + 1)
+            self.counters["synchronous"] += 1
+            self.condition.notify()
+        return self.build(index)
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+
+
+class Player:
+    def __init__(self, maze, clock=time):
+        self.position = [START_CELL[0] * CELL_SIZE, START_CELL[1] * CELL_SIZE]
+        self.direction = [0, 0]
+        self.clock = clock
+        self.last_move_time = self.clock.time()
+        self.reached_endpoint = False
+        self.maze = maze
+
+    def move(self):
+        current_time = self.clock.time()
+        if current_time - self.last_move_time >= COOLDOWN_TIME:
+            new_x = self.position[0] + self.direction[0]
+            new_y = self.position[1] + self.direction[1]
+            grid_x, grid_y = new_x // CELL_SIZE, new_y // CELL_SIZE
+            if self.maze.is_open(grid_x, grid_y):
+                self.position[0] = new_x
+                self.position[1] = new_y
+                self.last_move_time = current_time
+                if (grid_x, grid_y) == self.maze.endpoint_pos:
+                    self.reached_endpoint = True  # Set flag if the player reaches the endpoint
+
+    def handle_event(self, event):
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_UP:
+                self.direction = [0, -PLAYER_SPEED]
+            elif event.key == pygame.K_DOWN:
+                self.direction = [0, PLAYER_SPEED]
+            elif event.key == pygame.K_LEFT:
+                self.direction = [-PLAYER_SPEED, 0]
+            elif event.key == pygame.K_RIGHT:
+                self.direction = [PLAYER_SPEED, 0]
+        elif event.type == pygame.KEYUP:
+            if event.key in [pygame.K_UP, pygame.K_DOWN, pygame.K_LEFT, pygame.K_RIGHT]:
+                self.direction = [0, 0]
+
+    def reset(self):
+        self.position = [START_CELL[0] * CELL_SIZE, START_CELL[1] * CELL_SIZE]
+        self.reached_endpoint = False
+
+class Death:
+    def __init__(self, maze, player, scheduler, field=None, rng=random, position=None):
+        self.maze = maze
+        self.player = player
+        self.scheduler = scheduler
+        self.rng = rng
+        self.position = self.spawn_faraway() if position is None else position
+        self.move_interval = 5.0
+        self.speed_increase = 0.1
+        self.moving = True
+        self.field = field  # Prebuilt by the level pipeline for finite mazes
+        self.update_field(self.player.position[0] // CELL_SIZE, self.player.position[1] // CELL_SIZE)
+        self.move_event = self.scheduler.schedule(0, self.move)
+
+    def spawn_faraway(self):
+        cells = self.maze.open_cells()
+        if cells is not None:
+            # The player is on the start cell whenever Death spawns
+            return cells.random_away(self.rng, DEATH_SPAWN_DISTANCE)
+
+        while True:
+            x, y = self.maze.endpoint_pos
+            while True:
+                x += self.rng.choice([-1, 0, 1])
+                y += self.rng.choice([-1, 0, 1])
+                if x < 0 or y < 0:
+                    break  # Wandered off the maze, start over from the exit
+                if (
+                    self.maze.is_open(x, y) and
+                    abs(x - self.player.position[0] // CELL_SIZE) > 5 and
+                    abs(y - self.player.position[1] // CELL_SIZE) > 5
+                ):
+                    return x, y
+
+    def update_field(self, player_x, player_y):
+        if math.isinf(self.maze.width):
+            # Endless mazes are pathed over a window that follows the player
+            radius = DEATH_FIELD_RADIUS
+            if self.field is None or not self.field.contains(player_x, player_y, radius // 2):
+                self.field = DistanceField(self.maze, (player_x, player_y), player_x - radius, player_y - radius,
+                                           player_x + radius + 1, player_y + radius + 1)
+        elif self.field is None:
+            self.field = DistanceField(self.maze, (player_x, player_y))
+
+    def step(self):
+        player_x = self.player.position[0] // CELL_SIZE
+        player_y = self.player.position[1] // CELL_SIZE
+        self.update_field(player_x, player_y)
+
+        next_position = self.field.next_step(self.position, (player_x, player_y))
+        if next_position is None and self.reroute(player_x, player_y):
+            next_position = self.field.next_step(self.position, (player_x, player_y))
+        if next_position is not None:
+            self.position = next_position
+            return
+
+        # No route inside the window (far away in endless mode): one step along open
+        # cells towards the player if there is one, never through a wall
+        x, y = self.position
+        for dx, dy in (((player_x > x) - (player_x < x), 0), (0, (player_y > y) - (player_y < y))):
+            if (dx or dy) and self.maze.is_open(x + dx, y + dy):
+                self.position = (x + dx, y + dy)
+                return
+
+    def reroute(self, player_x, player_y):
+        # In endless mode Death can be in the window yet cut off from the player inside
+        # it. When the two are close, recentre the window between them so the path that
+        # joins them outside the old one is inside the new one. Returns False if there
+        # is nothing new to try.
+        x, y = self.position
+        radius = DEATH_FIELD_RADIUS
+        if not math.isinf(self.maze.width) or max(abs(x - player_x), abs(y - player_y)) > radius:
+            return False
+        cx, cy = (x + player_x) // 2, (y + player_y) // 2
+        if (self.field.x0, self.field.y0) == (cx - radius - 1, cy - radius - 1):
+            return False  # Already tried this window
+        self.field = DistanceField(self.maze, (player_x, player_y), cx - radius, cy - radius,
+                                   cx + radius + 1, cy + radius + 1)
+        return True
+
+    def move(self):
+        # Scheduled movement, every move comes a little sooner than the last
+        self.step()
+        self.move_event = self.scheduler.schedule(self.scheduler.ticks(self.move_interval), self.move)
+        self.move_interval = max(0.1, self.move_interval - self.speed_increase)
+
+    def stop(self):
+        self.moving = False
+        self.scheduler.cancel(self.move_event)
+
+    def check_collision(self):
+        return self.position == (self.player.position[0] // CELL_SIZE, self.player.position[1] // CELL_SIZE)
+
+class HunterCrowd:
+    # The hunters of horde mode, kept as coordinate arrays rather than an object each.
+    # They all step at once every HUNTER_STEP_TICKS along one flow field towards the
+    # player, taken from the level's distance field when the player changes cell. A step,
+    # the collision check and finding the ones on screen are a few array operations
+    # over the whole crowd.
+    def __init__(self, maze, player, scheduler, field, count=HORDE_SIZE, rng=random, positions=None):
+        self.player = player
+        self.scheduler = scheduler
+        self.field = field
+        if positions is None:
+            generator = np.random.default_rng(rng.getrandbits(64))
+            positions = maze.open_cells().sample_away(generator, DEATH_SPAWN_DISTANCE, count)
+        self.xs, self.ys = positions
+        self.previous_xs, self.previous_ys = self.xs, self.ys  # Before the last tick, for drawing
+        self.flow = None
+        self.flow_target = None
+        self.step_event = self.scheduler.schedule(HUNTER_STEP_TICKS, self.step)
+
+    def __len__(self):
+        return len(self.xs)
+
+    def player_cell(self):
+        return self.player.position[0] // CELL_SIZE, self.player.position[1] // CELL_SIZE
+
+    def step(self):
+        self.step_event = self.scheduler.schedule(HUNTER_STEP_TICKS, self.step)
+        target = self.player_cell()
+        if target != self.flow_target:
+            self.flow = self.field.flow(target)
+            self.flow_target = target
+        if self.flow is None:
+            return
+
+        # New arrays rather than in place, the previous ones are still drawn from
+        field = self.field
+        j = self.flow[(self.ys - field.y0) * field.width + (self.xs - field.x0)]
+        ys, xs = np.divmod(j, field.width)
+        self.xs = (xs + field.x0).astype(np.int32)
+        self.ys = (ys + field.y0).astype(np.int32)
+
+    def save_previous(self):
+        self.previous_xs, self.previous_ys = self.xs, self.ys
+
+    def check_collision(self):
+        x, y = self.player_cell()
+        return bool(np.any((self.xs == x) & (self.ys == y)))
+
+    def within(self, x0, y0, x1, y1):
+        # Mask of the hunters in cells x0 <= x < x1, y0 <= y < y1
+        return (self.xs >= x0) & (self.xs < x1) & (self.ys >= y0) & (self.ys < y1)
+
+    def stop(self):
+        self.scheduler.cancel(self.step_event)
+
+
+class PhantomPool:
+    # The wall phantoms as a struct of arrays. Visible phantoms are packed at the front of
+    # xs/ys so batched maths only runs over them, and `cells` counts the phantoms on each
+    # grid cell so a collision check is one dict lookup. The pool is allocated once and
+    # reused for every level.
+    def __init__(self, capacity=255):
+        self.capacity = capacity
+        self.xs = np.zeros(capacity, dtype=np.int32)
+        self.ys = np.zeros(capacity, dtype=np.int32)
+        self.count = 0
+        self.cells = {}
+        self.cached_distances = None
+        self.cached_for = None
+
+    def __len__(self):
+        return self.count
+
+    def full(self):
+        return self.count == self.capacity
+
+    def spawn(self, x, y):
+        if self.full():
+            return False
+        self.xs[self.count] = x
+        self.ys[self.count] = y
+        self.count += 1
+        self.cells[(x, y)] = self.cells.get((x, y), 0) + 1
+        self.cached_for = None
+        return True
+
+    def occupied(self, x, y):
+        return (x, y) in self.cells
+
+    def remove(self, x, y):
+        # Remove one phantom standing on (x, y), the last visible one takes its slot
+        remaining = self.cells.get((x, y), 0) - 1
+        if remaining < 0:
+            return False
+        if remaining:
+            self.cells[(x, y)] = remaining
+        else:
+            del self.cells[(x, y)]
+        i = np.flatnonzero((self.xs[:self.count] == x) & (self.ys[:self.count] == y))[0]
+        self.count -= 1
+        self.xs[i] = self.xs[self.count]
+        self.ys[i] = self.ys[self.count]
+        self.cached_for = None
+        return True
+
+    def clear(self):
+        self.count = 0
+        self.cells.clear()
+        self.cached_for = None
+
+    def positions(self):
+        return self.xs[:self.count], self.ys[:self.count]
+
+    def within(self, x0, y0, x1, y1):
+        # Mask of the visible phantoms in cells x0 <= x < x1, y0 <= y < y1
+        xs, ys = self.positions()
+        return (xs >= x0) & (xs < x1) & (ys >= y0) & (ys < y1)
+
+    def distances(self, position):
+        # Pixel distances from position to every visible phantom. Shake and the arrow
+        # both need them, so they are computed once per player position and pool change
+        key = (position[0], position[1])
+        if self.cached_for != key:
+            self.cached_distances = np.hypot(position[0] - self.xs[:self.count] * CELL_SIZE,
+                                             position[1] - self.ys[:self.count] * CELL_SIZE)
+            self.cached_for = key
+        return self.cached_distances
+
+
+class Presenter:
+    # Gets the finished base surface onto the display. Draw calls mark the rects they
+    # touch, and only those and last frame's rects (to clear what moved away) are copied
+    # and sent with display.update. Scaling is skipped when the window is the base size.
+    # Whole-number scale factors scale just the dirty rects. Any other size scales the
+    # whole frame into one reused surface.
+    def __init__(self):
+        self.rects = []
+        self.previous_rects = []
+        self.full = True
+        self.scaled = None
+        self.screen_size = None
+
+    def mark(self, rect):
+        rect = pygame.Rect(rect)
+        if rect.width and rect.height:  # Draw calls clipped away entirely return empty rects
+            self.rects.append(rect)
+
+    def invalidate(self):
+        self.full = True
+
+    def present(self, screen, base):
+        screen_size = screen.get_size()
+        base_rect = base.get_rect()
+        if screen_size != self.screen_size:
+            self.screen_size = screen_size
+            self.full = True
+
+        factor = screen_size[0] // base_rect.width
+        if factor == 0 or screen_size != (base_rect.width * factor, base_rect.height * factor):
+            # Fractional scale, dirty rects would not line up on screen pixels
+            if self.scaled is None or self.scaled.get_size() != screen_size:
+                self.scaled = pygame.Surface(screen_size)
+            pygame.transform.scale(base, screen_size, self.scaled)
+            screen.blit(self.scaled, (0, 0))
+            pygame.display.flip()
+            self.rects = []
+            self.full = False
+            return
+
+        rects = self.rects + self.previous_rects
+        if self.full or len(rects) > PRESENT_MAX_RECTS:
+            rects = [base_rect]
+        self.previous_rects = [base_rect] if self.full else self.rects
+        self.rects = []
+        self.full = False
+
+        updated = []
+        for rect in rects:
+            rect = rect.clip(base_rect)
+            if not rect.width or not rect.height:
+                continue
+            if factor == 1:
+                screen.blit(base, rect.topleft, rect)
+                updated.append(rect)
+            else:
+                scaled_rect = pygame.Rect(rect.x * factor, rect.y * factor, rect.width * factor, rect.height * factor)
+                screen.blit(pygame.transform.scale(base.subsurface(rect), scaled_rect.size), scaled_rect.topleft)
+                updated.append(scaled_rect)
+        pygame.display.update(updated)
+
+
+class TextCache:
+    # Fonts are loaded once per size and rendered text is kept in an LRU keyed by font,
+    # text and color, so labels that rarely change are blitted instead of rendered again
+    # every frame. Text that changes often but draws from a few characters, like the
+    # timer, is composed from a glyph atlas: every character on one surface, rendered once.
+    def __init__(self, capacity=TEXT_CACHE_SIZE):
+        self.capacity = capacity
+        self.fonts = {}
+        self.surfaces = OrderedDict()
+        self.atlases = {}
+
+    def font(self, size):
+        font = self.fonts.get(size)
+        if font is None:
+            font = self.fonts[size] = pygame.font.Font(None, size)
+        return font
+
+    def render(self, text, size, color=(255, 255, 255)):
+        key = (size, text, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+        surface = self.surfaces[key] = self.font(size).render(text, True, color)
+        if len(self.surfaces) > self.capacity:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def glyph_atlas(self, size, color=(255, 255, 255), glyphs=TIMER_GLYPHS):
+        # One surface with the glyphs side by side and the area of each
+        key = (size, color, glyphs)
+        atlas = self.atlases.get(key)
+        if atlas is None:
+            images = [self.font(size).render(glyph, True, color) for glyph in glyphs]
+            surface = pygame.Surface((sum(image.get_width() for image in images),
+                                      max(image.get_height() for image in images)), pygame.SRCALPHA)
+            areas = {}
+            x = 0
+            for glyph, image in zip(glyphs, images):
+                surface.blit(image, (x, 0))
+                areas[glyph] = pygame.Rect(x, 0, image.get_width(), image.get_height())
+                x += image.get_width()
+            atlas = self.atlases[key] = (surface, areas)
+        return atlas
+
+    def glyphs_size(self, text, size, color=(255, 255, 255)):
+        surface, areas = self.glyph_atlas(size, color)
+        return sum(areas[char].width for char in text), surface.get_height()
+
+    def draw_glyphs(self, target, text, position, size, color=(255, 255, 255)):
+        surface, areas = self.glyph_atlas(size, color)
+        x, y = position
+        for char in text:
+            area = areas[char]
+            target.blit(surface, (x, y), area)
+            x += area.width
+
+
+class Audio:
+    # Sound effects are decoded once into in-memory Sounds, each played on a reserved
+    # channel so it never has to find or steal a free one. The ambience streams through
+    # mixer.music the whole game, effects duck its volume instead of stopping and
+    # restarting it. counters tracks every decode and playback for profiling.
+    # The mixer starts and the assets load on a background thread so the menu does not
+    # wait for them; wait() blocks until they are ready.
+    def __init__(self):
+        self.counters = {"decoded": 0, "cache_loaded": 0, "played": 0, "music_started": 0, "ducked": 0}
+        self.sounds = {}
+        self.channels = {}
+        self.music_playing = False
+        self.ducked = False
+        self.ready = threading.Event()
+        self.error = None
+        self.load_time = None
+        self.loader = threading.Thread(target=self.load, daemon=True)
+        self.loader.start()
+
+    def load(self):
+        start = time.perf_counter()
+        try:
+            pygame.mixer.init()
+            pygame.mixer.set_reserved(len(SOUND_EFFECTS))
+            for index, (name, filename) in enumerate(SOUND_EFFECTS.items()):
+                self.sounds[name] = self.load_sound(filename)
+                self.channels[name] = pygame.mixer.Channel(index)
+            pygame.mixer.music.load(os.path.join(SFX_DIR, AMBIENCE))
+            pygame.mixer.music.set_volume(AMBIENCE_VOLUME)
+        except Exception as e:
+            self.error = e  # Raised by wait() on the main thread, missing files included
+        finally:
+            self.load_time = time.perf_counter() - start
+            self.ready.set()
+
+    def load_sound(self, filename):
+        # The first run decodes the MP3 and caches the samples in the mixer's format,
+        # later runs copy them straight into a Sound. The ambience is streamed and not cached.
+        frequency, size, channels = pygame.mixer.get_init()
+        path = os.path.join(SFX_DIR, filename)
+        cache_path = os.path.join(SFX_CACHE_DIR, f"{os.path.splitext(filename)[0]}_{frequency}_{size}_{channels}.pcm")
+        if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(path):
+            with open(cache_path, "rb") as f:
+                sound = pygame.mixer.Sound(buffer=f.read())
+            self.counters["cache_loaded"] += 1
+            return sound
+
+        sound = pygame.mixer.Sound(path)
+        self.counters["decoded"] += 1
+        try:
+            os.makedirs(SFX_CACHE_DIR, exist_ok=True)
+            with open(cache_path + ".tmp", "wb") as f:
+                f.write(sound.get_raw())
+            os.replace(cache_path + ".tmp", cache_path)
+        except OSError:
+            pass  # Read only install, decode again next run
+        return sound
+
+    def wait(self):
+        self.ready.wait()
+        if self.error is not None:
+            raise self.error
+
+    def play(self, name):
+        self.channels[name].play(self.sounds[name])
+        self.counters["played"] += 1
+
+    def start_music(self):
+        if not self.music_playing:
+            pygame.mixer.music.play(loops=-1)
+            self.music_playing = True
+            self.counters["music_started"] += 1
+        self.duck(False)
+
+    def stop_music(self):
+        pygame.mixer.music.stop()
+        self.music_playing = False
+
+    def duck(self, ducked=True):
+        if ducked != self.ducked:
+            pygame.mixer.music.set_volume(DUCKED_VOLUME if ducked else AMBIENCE_VOLUME)
+            self.ducked = ducked
+            if ducked:
+                self.counters["ducked"] += 1
+
+    def update(self):
+        # The ambience comes back once no effect is playing
+        if self.ducked and not any(channel.get_busy() for channel in self.channels.values()):
+            self.duck(False)
+
+
+class FrameProfiler:
+    # Times the stages of the game loop into a ring buffer of the last PROFILE_FRAMES
+    # frames, in seconds from perf_counter. Enabling it wraps the timed methods on their
+    # instances and disabling removes the wrappers, so an unprofiled game calls the
+    # plain methods. "pace" is the wait for the next frame, "frame" the whole frame.
+    def __init__(self, capacity=PROFILE_FRAMES):
+        self.capacity = capacity
+        self.samples = np.zeros((capacity, len(PROFILE_STAGES)))
+        self.current = [0.0] * len(PROFILE_STAGES)
+        self.count = 0  # Frames recorded since the profiler was created
+        self.enabled = False
+        self.wrapped = []
+        self.frame_start = 0
+
+    def wrap(self, owner, name, stage):
+        method = getattr(owner, name)
+        column = PROFILE_STAGES.index(stage)
+        current = self.current
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                current[column] += time.perf_counter() - start
+
+        setattr(owner, name, timed)
+        self.wrapped.append((owner, name))
+
+    def enable(self, game):
+        if self.enabled:
+            return
+        self.enabled = True
+        for owner, name in [(game, "handle_events"), (game.player, "move"), (game, "update_wallPhantoms"),
+                            (game, "update_shake_factor"), (game, "render"), (game, "draw_grid"),
+                            (game, "draw_player"), (game, "draw_arrow"), (game, "draw_death"),
+                            (game, "draw_timer"), (game.presenter, "present"), (game, "pace")]:
+            self.wrap(owner, name, "player.move" if owner is game.player else name)
+        self.frame_start = time.perf_counter()
+
+    def disable(self):
+        for owner, name in self.wrapped:
+            delattr(owner, name)  # The class's method shows through again
+        self.wrapped = []
+        self.enabled = False
+
+    def end_frame(self):
+        now = time.perf_counter()
+        self.current[-1] = now - self.frame_start
+        self.frame_start = now
+        self.samples[self.count % self.capacity] = self.current
+        self.count += 1
+        self.current[:] = [0.0] * len(PROFILE_STAGES)
+
+    def frames(self):
+        # Recorded frames, oldest first
+        if self.count <= self.capacity:
+            return self.samples[:self.count]
+        return np.roll(self.samples, -(self.count % self.capacity), axis=0)
+
+    def percentiles(self):
+        # p50, p95 and p99 of every stage in milliseconds
+        frames = self.frames()
+        if not len(frames):
+            return {}
+        values = np.percentile(frames, [50, 95, 99], axis=0) * 1e3
+        return {stage: tuple(values[:, i].tolist()) for i, stage in enumerate(PROFILE_STAGES)}
+
+    def export(self, path):
+        # CSV with one row per frame, or JSON with the frames and the percentiles, by extension
+        frames = self.frames() * 1e3
+        if path.endswith(".json"):
+            with open(path, "w") as f:
+                json.dump({"unit": "ms", "stages": PROFILE_STAGES, "frames": frames.tolist(),
+                           "percentiles": {stage: dict(zip(("p50", "p95", "p99"), values))
+                                           for stage, values in self.percentiles().items()}}, f, indent=2)
+        else:
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow([stage + "_ms" for stage in PROFILE_STAGES])
+                writer.writerows(frames.tolist())
+
+
+def write_varint(file, value):
+    # Little endian base 128, one byte for values below 128
+    while value >= 0x80:
+        file.write(bytes([value & 0x7F | 0x80]))
+        value >>= 7
+    file.write(bytes([value]))
+
+
+class InputRecorder:
+    # Writes the input that changes the game to a compact binary log: a header with the
+    # seed and maze algorithm, then one record per key press or release, start_game and
+    # the end of the session. A record is the ticks since the previous record as a varint
+    # and one code byte, so most take two bytes.
+    def __init__(self, path, seed, algorithm):
+        self.file = open(path, "wb")
+        self.file.write(REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, seed, list(Maze.generators).index(algorithm)))
+        self.last_tick = 0
+
+    def record(self, tick, code):
+        write_varint(self.file, tick - self.last_tick)
+        self.file.write(bytes([code]))
+        self.last_tick = tick
+
+    def record_event(self, tick, event):
+        if event.type in (pygame.KEYDOWN, pygame.KEYUP) and event.key in REPLAY_KEYS:
+            self.record(tick, REPLAY_KEYS.index(event.key) | (REPLAY_KEY_UP if event.type == pygame.KEYUP else 0))
+
+    def record_start(self, tick, mode):
+        self.record(tick, REPLAY_START | REPLAY_MODES.index(mode))
+
+    def close(self, tick):
+        self.record(tick, REPLAY_END)
+        self.file.close()
+
+
+class InputPlayback:
+    # Feeds a recorded log back into a game on the ticks it was recorded on
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, self.seed, algorithm = REPLAY_HEADER.unpack_from(data)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError(f"{path} is not a version {REPLAY_VERSION} input recording")
+        self.algorithm = list(Maze.generators)[algorithm]
+
+        self.records = deque()
+        tick = 0
+        position = REPLAY_HEADER.size
+        while position < len(data):
+            delta = shift = 0
+            while True:
+                byte = data[position]
+                position += 1
+                delta |= (byte & 0x7F) << shift
+                shift += 7
+                if byte < 0x80:
+                    break
+            tick += delta
+            self.records.append((tick, data[position]))
+            position += 1
+        self.finished = False
+
+    def apply(self, game):
+        # Everything due before the game's next tick
+        while self.records and self.records[0][0] <= game.scheduler.tick:
+            code = self.records.popleft()[1]
+            if code == REPLAY_END:
+                self.finished = True
+            elif code & REPLAY_START:
+                game.start_game(REPLAY_MODES[code & ~REPLAY_START])
+            else:
+                event_type = pygame.KEYUP if code & REPLAY_KEY_UP else pygame.KEYDOWN
+                game.handle_input(pygame.event.Event(event_type, key=REPLAY_KEYS[code & ~REPLAY_KEY_UP]))
+        if not self.records:
+            self.finished = True
+
+
+class SnapshotWriter:
+    # Writes snapshots to disk on its own thread, so saving costs the game loop only the
+    # time to pack the state. Only the newest pending snapshot is kept, and each one is
+    # written to a temporary file that then replaces the save, so a crash mid-write
+    # never leaves a broken save behind.
+    def __init__(self, path):
+        self.path = path
+        self.pending = None
+        self.running = True
+        self.condition = threading.Condition()
+        self.counters = {"written": 0, "superseded": 0}
+        self.worker = threading.Thread(target=self.work, daemon=True)
+        self.worker.start()
+
+    def save(self, data):
+        with self.condition:
+            if self.pending is not None:
+                self.counters["superseded"] += 1
+            self.pending = data
+            self.condition.notify()
+
+    def work(self):
+        while True:
+            with self.condition:
+                while self.running and self.pending is None:
+                    self.condition.wait()
+                data, self.pending = self.pending, None
+            if data is None:
+                return
+            temporary = self.path + ".tmp"
+            with open(temporary, "wb") as f:
+                f.write(data)
+            os.replace(temporary, self.path)
+            self.counters["written"] += 1
+
+    def close(self):
+        # Returns once the last snapshot is on disk
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.worker.join()
+
+
+class Game:
+    def __init__(self, headless=False, maze_algorithm=MAZE_ALGORITHM, seed=None, level_prefetch=LEVEL_PREFETCH):
+        # Headless games run with no display or audio
+        self.headless = headless
+        self.started = time.perf_counter()
+        self.first_frame_time = None
+        if not headless:
+            # Only what the menu needs, the mixer starts on the audio loader thread
+            pygame.display.init()
+            pygame.font.init()
+            self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+            pygame.display.set_caption('Order of the Orderless')
+        self.clock = pygame.time.Clock()
+        # All game timers run off the scheduler's ticks, one per frame
+        self.scheduler = Scheduler()
+        # Everything random in the simulation draws from these, a session is its seed and input
+        self.rng = RandomStreams(seed)
+        self.recorder = None
+        self.playback = None
+        self.autosave = None  # SnapshotWriter when the game is saved as it is played
+        self.next_autosave = 0
+        self.maze = Maze(rng=self.rng.maze)
+        self.atlas = None if headless else MazeAtlas(self.maze)
+        self.fov = FieldOfView(self.maze)
+        self.player = Player(self.maze, clock=self.scheduler)
+        self.death = Death(self.maze, self.player, self.scheduler, rng=self.rng.death)
+        self.hunters = None  # HunterCrowd in horde mode
+        self.hunter_surface = pygame.Surface((CELL_SIZE, CELL_SIZE))
+        self.hunter_surface.fill(HUNTER_COLOR)
+        self.phantom_surface = pygame.Surface((CELL_SIZE, CELL_SIZE))  # Refilled every frame as it pulsates
+        self.wallPhantoms = PhantomPool(255)
+        self.level_pipeline = LevelPipeline(self.rng.maze.getrandbits(32), headless, level_prefetch, maze_algorithm)
+        self.shake_factor = 0
+        self.fullscreen = False
+        self.running = True
+
+        self.enemy_spawn_interval = 35
+        self.spawn_event = self.scheduler.schedule(self.enemy_spawn_interval, self.spawn_wallPhantom)
+        self.spawn_remaining = 0
+
+        self.jumpscare_duration = 0.5
+        self.jumpscare_started = 0
+        self.jumpscare_event = None
+        self.jumpscare_active = False
+
+        self.music_loaded = False
+        self.audio = None if headless else Audio()
+
+        self.blackout_duration = 0.2
+        self.blackout_started = 0
+        self.blackout_event = None
+        self.blackout_active = False
+        self.base_surface = None if headless else pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        self.presenter = Presenter()
+        self.presented_camera = None
+        self.text = TextCache()
+        self.profiler = FrameProfiler()
+        self.profile_overlay = None  # Surface with the profiler's percentiles while shown
+        self.profile_path = None  # Where the profile is written when the game quits
+
+        # The simulation runs TICK_RATE fixed ticks a second off an accumulator of real time,
+        # frames come at render_fps and draw between the last two ticks
+        self.render_fps = FPS
+        self.accumulator = 0
+        self.last_frame_time = time.perf_counter()
+        self.frame_ticks = 0  # Ticks simulated in the last frame
+        self.previous_state = None  # Player, Death and camera before the last tick
+        self.camera_x = self.camera_y = 0
+        self.view_x = self.view_y = 0  # Camera offset in pixels as drawn
+
+        # Adaptive pacing drops to IDLE_FPS while the screen is still
+        self.adaptive_pacing = True
+        self.idle_ticks = 0
+        self.frame_time = 0
+
+        # Cooldown variables
+        self.cooldown_active = False
+        self.cooldown_duration = 5
+        self.in_menu = True
+
+        # Total time variable
+        self.total_time = 0  
+        self.game_mode_selected = False
+        self.game_mode = None
+
+        self.level = 0
+        self.timer_running = True
+        self.death_occurred = False
+        self.deaths = 0
+        self.levels_completed = 0
+
+        self.e_key_held_time = 0
+        self.e_key_down = False
+        self.E_HOLD_TIME = 3
+
+        self.fade_in = True
+        self.fade_alpha = 0
+        self.fade_last_time = self.scheduler.time()
+        self.fade_interval = 1
+
+    def show_death_screen(self):
+        self.death_occurred = True
+        self.reset(due_to_death=True)
+        self.in_menu = True
+
+        self.audio.stop_music()
+        self.audio.play("death")
+        self.music_loaded = False  # The ambience starts again with the next game
+
+        self.screen.fill(DEATH_SCREEN_COLOR)
+        text = self.text.render("Death caught up to you", 36, DEATH_SCREEN_TEXT_COLOR)
+        text_rect = text.get_rect(center=(SCREEN_WIDTH * CELL_SIZE // 2, SCREEN_HEIGHT * CELL_SIZE // 2))
+        self.screen.blit(text, text_rect)
+        pygame.display.flip()
+        pygame.time.wait(2000)
+
+    def run(self):
+        if self.playback is not None:
+            self.playback.apply(self)  # Starts the recorded game mode, there is no menu in a replay
+        while self.running:
+            if self.in_menu and self.playback is None:
+                self.main_menu()
+            else:
+
+                if not self.music_loaded:
+                    self.audio.start_music()
+                    self.music_loaded = True
+               
+                self.handle_events()
+                self.frame_ticks = self.advance_simulation()
+                if self.autosave is not None and self.scheduler.tick >= self.next_autosave:
+                    self.save()
+                self.render(self.accumulator * TICK_RATE)
+                self.audio.update()
+                self.pace()
+                if self.profiler.enabled:
+                    self.profiler.end_frame()
+
+        self.level_pipeline.stop()
+        if self.autosave is not None:
+            if self.game_mode is not None:
+                self.save()
+            self.autosave.close()
+        if self.recorder is not None:
+            self.recorder.close(self.scheduler.tick)
+        if self.profile_path:
+            self.profiler.export(self.profile_path)
+        if self.audio is not None:
+            self.audio.wait()  # Do not shut SDL down under the loader thread
+        pygame.quit()
+
+    def advance_simulation(self):
+        # Run as many fixed ticks as real time has passed since the last frame, the
+        # remainder stays in the accumulator for the next one
+        now = time.perf_counter()
+        self.accumulator += min(now - self.last_frame_time, MAX_FRAME_TIME)
+        self.last_frame_time = now
+        ticks = 0
+        while self.accumulator >= 1 / TICK_RATE:
+            if self.playback is not None:
+                self.playback.apply(self)
+                if self.playback.finished:
+                    self.running = False
+                    break
+            self.update()
+            self.accumulator -= 1 / TICK_RATE
+            ticks += 1
+            if self.in_menu:
+                self.accumulator = 0
+                break
+        return ticks
+
+    def update(self):
+        # One tick of game logic, shared by the windowed and headless loops
+        self.previous_state = (self.player.position[0], self.player.position[1], self.death.position,
+                               self.camera_x, self.camera_y)
+        if self.hunters is not None:
+            self.hunters.save_previous()
+        self.check_e_hold()
+        self.scheduler.advance()  # Death, hunters, spawns and effect timers
+        self.player.move()
+        if self.player.reached_endpoint:
+            self.timer_running = False
+        self.update_wallPhantoms()
+        self.update_shake_factor()
+        self.update_camera()
+
+        if self.check_for_enemy_encounter():
+            self.start_jumpscare()
+
+        if self.death.check_collision() or (self.hunters is not None and self.hunters.check_collision()):
+            if self.headless:
+                self.deaths += 1
+                self.death_occurred = True
+                self.reset(due_to_death=True)
+            else:
+                self.show_death_screen()
+
+        if self.timer_running:
+            self.total_time += 1
+
+    def is_idle(self):
+        # Nothing on screen moves or animates, only the timer counts up. Phantoms off
+        # screen still shake and spin the arrow, which counts once its tip would move a
+        # pixel or more between two idle frames.
+        death_x, death_y = self.death.position
+        x1, y1 = self.camera_x + SCREEN_WIDTH // CELL_SIZE, self.camera_y + SCREEN_HEIGHT // CELL_SIZE
+        if (self.player.direction != [0, 0] or self.e_key_down or self.jumpscare_active or self.blackout_active or
+                (self.camera_x <= death_x < x1 and self.camera_y <= death_y < y1) or
+                self.wallPhantoms.within(self.camera_x, self.camera_y, x1, y1).any() or
+                (self.hunters is not None and self.hunters.within(self.camera_x, self.camera_y, x1, y1).any())):
+            return False
+        spin_factor, spin_speed = self.arrow_spin()
+        turn_rate = ARROW_SHAKE_SPEED * self.shake_factor + spin_factor * spin_speed  # Radians per second at most
+        return turn_rate / IDLE_FPS * ARROW_LENGTH < 1
+
+    def pace(self):
+        # Wait for the next frame, render_fps apart (0 does not wait). Once the screen has
+        # been idle for IDLE_DELAY ticks frames come at IDLE_FPS instead. Input ends the
+        # wait early and handle_events puts the game back at full rate. The simulation
+        # keeps its pace either way, the next frame runs the ticks that passed.
+        if self.adaptive_pacing and self.is_idle():
+            self.idle_ticks += self.frame_ticks
+        else:
+            self.idle_ticks = 0
+        if self.idle_ticks >= IDLE_DELAY:
+            elapsed = pygame.time.get_ticks() - self.frame_time
+            if elapsed < 1000 // IDLE_FPS:
+                event = pygame.event.wait(1000 // IDLE_FPS - elapsed)
+                if event.type != pygame.NOEVENT:
+                    pygame.event.post(event)  # Left for handle_events
+            self.clock.tick()
+        else:
+            self.clock.tick(self.render_fps)
+        self.frame_time = pygame.time.get_ticks()
+
+    def start_jumpscare(self):
+        if not self.jumpscare_active and self.audio is not None:
+            # The sound plays once per jumpscare, not on every frame of it
+            self.audio.play("jumpscare")
+            self.audio.duck()
+        self.jumpscare_active = True
+        self.jumpscare_started = self.scheduler.tick
+        self.scheduler.cancel(self.jumpscare_event)
+        self.jumpscare_event = self.scheduler.schedule(self.scheduler.ticks(self.jumpscare_duration), self.end_jumpscare)
+
+    def end_jumpscare(self):
+        self.jumpscare_active = False
+
+    def start_blackout(self):
+        self.blackout_active = True
+        self.blackout_started = self.scheduler.tick
+        self.scheduler.cancel(self.blackout_event)
+        self.blackout_event = self.scheduler.schedule(self.scheduler.ticks(self.blackout_duration), self.end_blackout)
+
+    def end_blackout(self):
+        self.blackout_active = False
+
+    def start_cooldown(self):
+        # Phantoms stop spawning until the cooldown ends, the spawn timer resumes where it was
+        self.cooldown_active = True
+        self.spawn_remaining = self.scheduler.remaining(self.spawn_event)
+        self.scheduler.cancel(self.spawn_event)
+        self.scheduler.schedule(self.scheduler.ticks(self.cooldown_duration), self.end_cooldown)
+
+    def end_cooldown(self):
+        self.cooldown_active = False
+        self.spawn_event = self.scheduler.schedule(self.spawn_remaining, self.spawn_wallPhantom)
+
+    def simulate(self, ticks=None, levels=None, bot_seed=None):
+        # Fast-forward the game logic with a random walking bot instead of a player,
+        # one virtual frame per tick with no frame cap. Stops after the given number
+        # of ticks or finished levels (exit reached or caught by Death).
+        bot = random.Random(bot_seed)
+        moves = [[dx * PLAYER_SPEED, dy * PLAYER_SPEED] for dx, dy in DIRECTIONS]
+        tick = 0
+        start = time.perf_counter()
+        while self.running:
+            if ticks is not None and tick >= ticks:
+                break
+            if levels is not None and self.levels_completed + self.deaths >= levels:
+                break
+
+            if bot.random() < BOT_TURN_CHANCE:
+                self.player.direction = bot.choice(moves)
+            self.update()
+            if self.player.reached_endpoint:
+                self.levels_completed += 1
+                self.reset()
+            tick += 1
+        return tick, time.perf_counter() - start
+
+    def menu_events(self):
+        # Sleep until there is input, or at most MENU_EVENT_TIMEOUT, instead of spinning
+        event = pygame.event.wait(MENU_EVENT_TIMEOUT)
+        if event.type == pygame.NOEVENT:
+            return []
+        return [event] + pygame.event.get()
+
+    def replay(self):
+        # Play the loaded recording back as fast as possible, one tick per loop.
+        # Returns the number of ticks and the seconds it took, like simulate().
+        start = time.perf_counter()
+        ticks = 0
+        self.playback.apply(self)
+        while self.running and not self.playback.finished:
+            self.update()
+            ticks += 1
+            self.playback.apply(self)
+        return ticks, time.perf_counter() - start
+
+    def snapshot_callbacks(self):
+        # Everything the scheduler can hold, numbered by position in snapshots
+        return [self.death.move, self.spawn_wallPhantom, self.end_jumpscare, self.end_blackout, self.end_cooldown,
+                None if self.hunters is None else self.hunters.step]
+
+    def snapshot(self):
+        # The whole game as bytes: fixed size structs, the maze grid one bit per cell and
+        # fixed width records for the phantoms, hunters and scheduled events. The open
+        # cell index and Death's distance field go in as their int32 arrays, so loading
+        # does not search the maze again.
+        flags = [self.timer_running, self.death_occurred, self.cooldown_active, self.jumpscare_active,
+                 self.blackout_active, self.e_key_down, self.player.reached_endpoint]
+        parts = [
+            SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, REPLAY_MODES.index(self.game_mode)),
+            SNAPSHOT_GAME.pack(self.level, self.total_time, self.deaths, self.levels_completed, self.scheduler.tick,
+                               self.scheduler.sequence, sum(flag << i for i, flag in enumerate(flags)),
+                               self.spawn_remaining, self.jumpscare_started, self.blackout_started,
+                               self.e_key_held_time, self.enemy_spawn_interval),
+            SNAPSHOT_PLAYER.pack(*self.player.position, *self.player.direction, self.player.last_move_time),
+            SNAPSHOT_DEATH.pack(*self.death.position, self.death.move_interval, self.death.moving),
+            SNAPSHOT_PIPELINE.pack(self.level_pipeline.seed, self.level_pipeline.next_index),
+        ]
+        for name in RNG_STREAMS:
+            _, internal, gauss = getattr(self.rng, name).getstate()
+            parts.append(SNAPSHOT_RNG.pack(*internal, gauss is not None, gauss or 0.0))
+
+        def block(values, dtype=SNAPSHOT_ARRAY):
+            records = np.asarray(values, dtype=dtype)
+            return SNAPSHOT_COUNT.pack(len(records)) + records.tobytes()
+
+        def cells(xs, ys):
+            records = np.empty(len(xs), dtype=SNAPSHOT_CELL)
+            records["x"], records["y"] = xs, ys
+            return block(records, SNAPSHOT_CELL)
+
+        endless = isinstance(self.maze, EndlessMaze)
+        algorithm = list(Maze.generators).index(self.level_pipeline.algorithm)
+        if endless:
+            parts.append(SNAPSHOT_MAZE.pack(True, 0, 0, *self.maze.endpoint_pos, self.maze.seed, algorithm))
+        else:
+            parts.append(SNAPSHOT_MAZE.pack(False, self.maze.width, self.maze.height, *self.maze.endpoint_pos, 0,
+                                            algorithm))
+            parts.append(np.packbits(self.maze.grid.ravel() == 0).tobytes())
+            parts.extend(block(values) for values in self.maze.open_cells().arrays())
+        # In endless mode where the field was last rebuilt decides Death's path
+        field = self.death.field
+        parts.append(SNAPSHOT_FIELD.pack(field.x0, field.y0, field.width, field.height))
+        parts.extend(block(values) for values in (field.parent, field.tin, field.tout))
+
+        parts.append(cells(*self.wallPhantoms.positions()))
+        parts.append(cells(*((self.hunters.xs, self.hunters.ys) if self.hunters is not None else ([], []))))
+
+        callbacks = self.snapshot_callbacks()
+        events = [event for event in self.scheduler.events if event[2] is not None]
+        records = np.empty(len(events), dtype=SNAPSHOT_EVENT)
+        for record, (due, sequence, callback) in zip(records, events):
+            record["due"], record["sequence"], record["callback"] = due, sequence, callbacks.index(callback)
+        parts.append(block(records, SNAPSHOT_EVENT))
+        return b"".join(parts)
+
+    def save(self):
+        self.autosave.save(self.snapshot())
+        self.next_autosave = self.scheduler.tick + self.scheduler.ticks(AUTOSAVE_INTERVAL)
+
+    def load_snapshot(self, path):
+        # Puts the game exactly where the snapshot left it, random streams included. Nothing
+        # is generated or searched: the maze comes from its bits, the open cell index and
+        # distance field from their saved arrays.
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, mode = SNAPSHOT_HEADER.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f"{path} is not a version {SNAPSHOT_VERSION} snapshot")
+        offset = SNAPSHOT_HEADER.size
+
+        def read(layout):
+            nonlocal offset
+            values = layout.unpack_from(data, offset)
+            offset += layout.size
+            return values
+
+        def read_records(dtype):
+            nonlocal offset
+            count, = read(SNAPSHOT_COUNT)
+            records = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+            offset += count * dtype.itemsize
+            return records
+
+        (self.level, self.total_time, self.deaths, self.levels_completed, tick, sequence, flags,
+         self.spawn_remaining, self.jumpscare_started, self.blackout_started, self.e_key_held_time,
+         self.enemy_spawn_interval) = read(SNAPSHOT_GAME)
+        (self.timer_running, self.death_occurred, self.cooldown_active, self.jumpscare_active,
+         self.blackout_active, self.e_key_down, reached_endpoint) = [bool(flags >> i & 1) for i in range(7)]
+        player_x, player_y, direction_x, direction_y, last_move_time = read(SNAPSHOT_PLAYER)
+        death_x, death_y, move_interval, moving = read(SNAPSHOT_DEATH)
+        level_seed, next_index = read(SNAPSHOT_PIPELINE)
+        states = [read(SNAPSHOT_RNG) for _ in RNG_STREAMS]
+        endless, width, height, exit_x, exit_y, endless_seed, algorithm = read(SNAPSHOT_MAZE)
+        algorithm = list(Maze.generators)[algorithm]
+
+        self.game_mode = REPLAY_MODES[mode]
+        self.level_pipeline.stop()
+        self.level_pipeline = LevelPipeline(level_seed, self.headless, self.level_pipeline.capacity, algorithm,
+                                            next_index)
+        if endless:
+            self.maze = EndlessMaze(endless_seed, max(1, self.level))
+        else:
+            cells = np.frombuffer(data, dtype=np.uint8, count=(width * height + 7) // 8, offset=offset)
+            offset += len(cells)
+            grid = 1 - np.unpackbits(cells, count=width * height).reshape(height, width)
+            self.maze = Maze.from_grid(grid, (exit_x, exit_y), algorithm)
+            # Read only views of the file's bytes, the index never writes to them
+            self.maze.cells = OpenCellIndex.from_arrays(
+                self.maze, [read_records(SNAPSHOT_ARRAY).astype(np.int32, copy=False) for _ in range(5)])
+        field_x0, field_y0, field_width, field_height = read(SNAPSHOT_FIELD)
+        field_arrays = [array('i') for _ in range(3)]
+        for values in field_arrays:
+            values.frombytes(memoryview(read_records(SNAPSHOT_ARRAY).astype(np.int32, copy=False)).cast("B"))
+        field = DistanceField.from_arrays(field_x0, field_y0, field_width, field_height, *field_arrays)
+        self.atlas = None if self.headless else MazeAtlas(self.maze)
+        self.fov = FieldOfView(self.maze)
+
+        self.player.maze = self.maze
+        self.player.position = [player_x, player_y]
+        self.player.direction = [direction_x, direction_y]
+        self.player.last_move_time = last_move_time
+        self.player.reached_endpoint = reached_endpoint
+
+        self.death.stop()
+        self.death = Death(self.maze, self.player, self.scheduler, field, rng=self.rng.death,
+                           position=(death_x, death_y))
+        self.death.move_interval = move_interval
+        self.death.moving = moving
+
+        self.wallPhantoms.clear()
+        for x, y in read_records(SNAPSHOT_CELL).tolist():
+            self.wallPhantoms.spawn(x, y)
+        hunters = read_records(SNAPSHOT_CELL)
+        if self.hunters is not None:
+            self.hunters.stop()
+        self.hunters = None
+        if self.game_mode == "Horde":
+            self.hunters = HunterCrowd(self.maze, self.player, self.scheduler, field, rng=self.rng.hunters,
+                                       positions=(hunters["x"].astype(np.int32), hunters["y"].astype(np.int32)))
+
+        # The constructors above scheduled their own events, the saved queue replaces them
+        callbacks = self.snapshot_callbacks()
+        events = [[int(due), int(sequence), callbacks[callback]]
+                  for due, sequence, callback in read_records(SNAPSHOT_EVENT).tolist()]
+        heapq.heapify(events)
+        self.scheduler.tick = tick
+        self.scheduler.events = events
+        self.scheduler.sequence = sequence
+
+        def handle(callback):
+            return next((event for event in events if event[2] == callback), None)
+
+        self.death.move_event = handle(self.death.move)
+        self.spawn_event = handle(self.spawn_wallPhantom)
+        self.jumpscare_event = handle(self.end_jumpscare)
+        self.blackout_event = handle(self.end_blackout)
+        if self.hunters is not None:
+            self.hunters.step_event = handle(self.hunters.step)
+
+        for name, state in zip(RNG_STREAMS, states):
+            getattr(self.rng, name).setstate((3, state[:625], state[626] if state[625] else None))
+
+        self.in_menu = False
+        self.presenter.invalidate()
+        self.idle_ticks = 0
+        self.previous_state = None
+        self.accumulator = 0
+        self.last_frame_time = time.perf_counter()
+        self.next_autosave = self.scheduler.tick + self.scheduler.ticks(AUTOSAVE_INTERVAL)
+        self.update_camera()
+        if self.audio is not None:
+            self.audio.wait()
+
+    def main_menu(self):
+        title_text = self.text.render("Order of the Orderless", int(60 * SCREEN_WIDTH / 800))  # Scale font size based on screen width
+        title_rect = title_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 4))
+
+        button_width = int(200 * SCREEN_WIDTH / 800)  # Scale button width based on screen width
+        button_height = int(100 * SCREEN_HEIGHT / 600)  # Scale button height based on screen height
+
+        start_button_rect = pygame.Rect(SCREEN_WIDTH // 2 - button_width // 2, SCREEN_HEIGHT // 2 - button_height // 2, button_width, button_height)
+        quit_button_rect = pygame.Rect(SCREEN_WIDTH // 2 - button_width // 2, SCREEN_HEIGHT // 2 + button_height // 2 + 50, button_width, button_height)
+
+        # The menu only changes on input, so it is drawn again only when something happened
+        redraw = True
+        while self.in_menu:
+            if redraw:
+                redraw = False
+                self.screen.fill((0, 0, 0))
+
+                # Draw title
+                self.screen.blit(title_text, title_rect)
+
+                font_size = int(36 * SCREEN_WIDTH / 800)  # Scale font size based on screen width
+
+                # Draw Start Game button outline
+                pygame.draw.rect(self.screen, (255, 255, 255), start_button_rect, 2)
+                start_text = self.text.render("Start Game", font_size)
+                self.screen.blit(start_text, (start_button_rect.centerx - start_text.get_width() // 2,
+                                            start_button_rect.centery - start_text.get_height() // 2))
+
+                # Draw Quit button outline
+                pygame.draw.rect(self.screen, (255, 255, 255), quit_button_rect, 2)
+                quit_text = self.text.render("Quit", font_size)
+                self.screen.blit(quit_text, (quit_button_rect.centerx - quit_text.get_width() // 2,
+                                            quit_button_rect.centery - quit_text.get_height() // 2))
+
+                pygame.display.flip()
+                if self.first_frame_time is None:
+                    self.first_frame_time = time.perf_counter() - self.started
+
+            for event in self.menu_events():
+                if event.type == pygame.QUIT:
+                    self.running = False
+                    self.in_menu = False
+                elif event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_ESCAPE:
+                        self.running = False
+                        self.in_menu = False
+                    elif event.key == pygame.K_F11:
+                        # Toggle full screen mode on F11 key press
+                        self.fullscreen = not self.fullscreen
+                        if self.fullscreen:
+                            screen_info = pygame.display.Info()
+                            screen_width = screen_info.current_w
+                            screen_height = screen_info.current_h
+                            self.screen = pygame.display.set_mode((screen_width, screen_height), pygame.FULLSCREEN)
+                        else:
+                            self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+                        redraw = True
+                elif event.type == pygame.MOUSEBUTTONDOWN:
+                    if start_button_rect.collidepoint(event.pos):
+                        self.show_game_modes()
+                        redraw = True
+                    elif quit_button_rect.collidepoint(event.pos):
+                        self.running = False
+                        self.in_menu = False
+                elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                    redraw = True
+
+    def show_game_modes(self):
+        title_text = self.text.render("Select Game Mode", 60)
+        title_rect = title_text.get_rect(center=(SCREEN_WIDTH // 1.9, SCREEN_HEIGHT // 4))
+
+
+        normal_button_rect = pygame.Rect(100, SCREEN_HEIGHT // 2 - 50, 300, 100)
+        desperate_button_rect = pygame.Rect(450, SCREEN_HEIGHT // 2 - 50, 300, 100)
+        endless_button_rect = pygame.Rect(100, SCREEN_HEIGHT // 2 + 80, 300, 100)
+        horde_button_rect = pygame.Rect(450, SCREEN_HEIGHT // 2 + 80, 300, 100)
+
+        redraw = True
+        while self.in_menu:
+            if redraw:
+                redraw = False
+                self.screen.fill((0, 0, 0))
+
+                self.screen.blit(title_text, title_rect)
+
+                # Draw Normal mode button
+                pygame.draw.rect(self.screen, (0, 255, 0), normal_button_rect)
+                normal_text = self.text.render("Normal Survival Mode", 36)
+                self.screen.blit(normal_text, (normal_button_rect.centerx - normal_text.get_width() // 2,
+                                            normal_button_rect.centery - normal_text.get_height()))
+
+                # Draw Desperate mode button
+                pygame.draw.rect(self.screen, (255, 0, 0), desperate_button_rect)
+                desperate_text = self.text.render("Desperate Survival Mode", 36)
+                self.screen.blit(desperate_text, (desperate_button_rect.centerx - desperate_text.get_width() // 2,
+                                                desperate_button_rect.centery - desperate_text.get_height()))
+
+                # Draw Endless mode button
+                pygame.draw.rect(self.screen, (0, 0, 255), endless_button_rect)
+                endless_text = self.text.render("Endless Labyrinth", 36)
+                self.screen.blit(endless_text, (endless_button_rect.centerx - endless_text.get_width() // 2,
+                                              endless_button_rect.centery - endless_text.get_height()))
+
+                # Draw Horde mode button
+                pygame.draw.rect(self.screen, HUNTER_COLOR, horde_button_rect)
+                horde_text = self.text.render("Horde Mode", 36)
+                self.screen.blit(horde_text, (horde_button_rect.centerx - horde_text.get_width() // 2,
+                                            horde_button_rect.centery - horde_text.get_height()))
+
+                pygame.display.flip()
+
+            for event in self.menu_events():
+                if event.type == pygame.QUIT:
+                    self.running = False
+                    self.in_menu = False
+                elif event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_ESCAPE:
+                        self.running = False
+                        self.in_menu = False
+                    elif event.key == pygame.K_F11:
+                        # Toggle full screen mode on F11 key press
+                        self.fullscreen = not self.fullscreen
+                        if self.fullscreen:
+                            screen_info = pygame.display.Info()
+                            screen_width = screen_info.current_w
+                            screen_height = screen_info.current_h
+                            self.screen = pygame.display.set_mode((screen_width, screen_height), pygame.FULLSCREEN)
+                        else:
+                            self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+                        redraw = True
+                elif event.type == pygame.MOUSEBUTTONDOWN:
+                    if normal_button_rect.collidepoint(event.pos):
+                        self.in_menu = False
+                        self.start_game("Normal")
+                    elif desperate_button_rect.collidepoint(event.pos):
+                        self.in_menu = False
+                        self.start_game("Desperate")
+                    elif endless_button_rect.collidepoint(event.pos):
+                        self.in_menu = False
+                        self.start_game("Endless")
+                    elif horde_button_rect.collidepoint(event.pos):
+                        self.in_menu = False
+                        self.start_game("Horde")
+                elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                    redraw = True
+
+    def start_game(self, mode):
+        self.in_menu = False
+        if self.recorder is not None:
+            self.recorder.record_start(self.scheduler.tick, mode)
+        if self.audio is not None:
+            self.audio.wait()  # Usually loaded long before a mode is picked
+        if mode == "Normal":
+            self.game_mode = "Normal"
+        elif mode == "Desperate":
+            self.game_mode = "Desperate"
+        elif mode == "Endless":
+            self.game_mode = "Endless"
+        elif mode == "Horde":
+            self.game_mode = "Horde"
+        self.reset()
+        self.next_autosave = self.scheduler.tick + self.scheduler.ticks(AUTOSAVE_INTERVAL)
+
+    def handle_events(self):
+        for event in pygame.event.get():
+            if event.type in (pygame.KEYDOWN, pygame.KEYUP, pygame.MOUSEBUTTONDOWN):
+                self.idle_ticks = 0  # Input goes back to full rate
+
+            if event.type == pygame.QUIT:
+                self.running = False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                self.running = False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F11:
+                # Toggle full screen mode on F11 key press
+                self.fullscreen = not self.fullscreen
+                if self.fullscreen:
+                    self.screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+                else:
+                    self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                # Toggle the profiler overlay, profiling runs while it is shown
+                if self.profile_overlay is None:
+                    self.profiler.enable(self)
+                    self.profile_overlay = self.render_profile()
+                else:
+                    self.profile_overlay = None
+                    if not self.profile_path:
+                        self.profiler.disable()
+            elif self.playback is None:
+                # Gameplay input, a replay takes it from the log instead
+                if self.recorder is not None:
+                    self.recorder.record_event(self.scheduler.tick, event)
+                self.handle_input(event)
+
+    def handle_input(self, event):
+        # Input that changes the game, recorded and replayed tick by tick
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_RETURN and self.player.reached_endpoint:
+                self.reset()
+            elif event.key == pygame.K_e and self.game_mode == "Normal":
+                if not self.cooldown_active:
+                    self.e_key_down = True
+                    self.e_key_held_time = self.scheduler.time()
+
+        elif event.type == pygame.KEYUP:
+            if event.key == pygame.K_e:
+                self.e_key_down = False
+                self.e_key_held_time = 0
+
+        self.player.handle_event(event)
+
+    def check_e_hold(self):
+        # Check if "E" key has been held for the required time
+        if self.e_key_down and (self.scheduler.time() - self.e_key_held_time >= self.E_HOLD_TIME):
+            if not self.cooldown_active:
+                # Hide all wallPhantoms
+                self.wallPhantoms.clear()
+                # Start cooldown timer
+                self.start_cooldown()
+                self.e_key_down = False  # Reset the e_key_down flag
+                self.e_key_held_time = 0  # Reset the e_key_held_time
+
+
+    def teleport_player(self):
+        # Get player's current grid position
+        player_grid_x = self.player.position[0] // CELL_SIZE
+        player_grid_y = self.player.position[1] // CELL_SIZE
+
+        # Define directions for movement
+        directions = [(0, -1), (1, 0), (0, 1), (-1, 0)]  # Up, Right, Down, Left
+
+        # Randomly shuffle directions to randomize teleportation direction
+        self.rng.teleport.shuffle(directions)
+
+        for distance in range(10, 21):  # Check distances from 10 to 20 cells away
+            for direction in directions:
+                dx, dy = direction
+                new_x = player_grid_x + dx * distance
+                new_y = player_grid_y + dy * distance
+
+                # Check if the new position is inside the maze and a passage/white cell
+                if self.maze.is_open(new_x, new_y):
+                    # Calculate the screen position of the new cell
+                    new_screen_x = new_x * CELL_SIZE
+                    new_screen_y = new_y * CELL_SIZE
+
+                    # Teleport the player to the new position
+                    self.player.position = [new_screen_x, new_screen_y]
+                    return  # Exit the method once a valid teleportation position is found
+
+        # If no suitable white cell found in the specified range, land on the open cell
+        # closest to where the first direction aimed
+        dx, dy = directions[0]
+        closest = self.maze.nearest_open(player_grid_x + dx * 10, player_grid_y + dy * 10)
+        if closest is not None:
+            self.player.position = [closest[0] * CELL_SIZE, closest[1] * CELL_SIZE]
+
+
+    def check_for_enemy_encounter(self):
+        player_grid_x = self.player.position[0] // CELL_SIZE
+        player_grid_y = self.player.position[1] // CELL_SIZE
+        if self.wallPhantoms.occupied(player_grid_x, player_grid_y):
+            # Teleport the player after collision
+            #self.teleport_player()
+            # Handle jump scare and blackout effect
+            self.start_jumpscare()
+            self.start_blackout()
+            self.wallPhantoms.remove(player_grid_x, player_grid_y)
+            return True
+        return False
+
+
+    def init_enemies(self):
+        self.wallPhantoms.clear()
+
+    def reset(self, due_to_death=False):
+        if due_to_death:
+            self.level = 0
+        else:
+            self.level += 1
+
+        # Reset maze, finite levels come ready made from the pipeline
+        if self.game_mode == "Endless":
+            self.maze = EndlessMaze(self.rng.maze.getrandbits(32), max(1, self.level))
+            self.atlas = None if self.headless else MazeAtlas(self.maze)
+            field = None
+        else:
+            level = self.level_pipeline.next()
+            self.maze, self.atlas, field = level.maze, level.atlas, level.field
+        self.fov = FieldOfView(self.maze)
+        
+        self.player.maze = self.maze  # Update player's maze reference
+        self.player.reset()
+
+        # Death hunts in the new maze
+        self.death.stop()
+        self.death = Death(self.maze, self.player, self.scheduler, field, rng=self.rng.death)
+        if self.hunters is not None:
+            self.hunters.stop()
+        self.hunters = None
+        if self.game_mode == "Horde":
+            self.hunters = HunterCrowd(self.maze, self.player, self.scheduler, self.death.field, rng=self.rng.hunters)
+
+        self.init_enemies()  # Reinitialize enemies
+        self.timer_running = True
+        self.presenter.invalidate()  # Menus and the death screen drew over the display
+        self.idle_ticks = 0
+        self.previous_state = None  # Nothing to interpolate from on a new level
+        self.accumulator = 0
+        self.last_frame_time = time.perf_counter()
+
+    def spawn_wallPhantom(self):
+        # Scheduled every enemy_spawn_interval ticks, paused while the cooldown is active
+        self.spawn_event = self.scheduler.schedule(self.enemy_spawn_interval, self.spawn_wallPhantom)
+        if self.wallPhantoms.full():
+            return
+
+        # Spawn on a random open cell other than the player's
+        player_grid_x = self.player.position[0] // CELL_SIZE
+        player_grid_y = self.player.position[1] // CELL_SIZE
+        self.wallPhantoms.spawn(*self.maze.random_open(self.rng.phantoms, player_grid_x, player_grid_y))
+
+    def update_wallPhantoms(self):
+        # Check for collision with player and handle jump scare
+        player_grid_x = self.player.position[0] // CELL_SIZE
+        player_grid_y = self.player.position[1] // CELL_SIZE
+        if self.wallPhantoms.occupied(player_grid_x, player_grid_y):
+            # Handle jump scare and blackout effect
+            self.start_jumpscare()
+            self.start_blackout()
+            self.wallPhantoms.remove(player_grid_x, player_grid_y)
+
+            # Teleport the player after collision
+            self.teleport_player()
+
+    def update_shake_factor(self):
+        if len(self.wallPhantoms):
+            min_distance = self.wallPhantoms.distances(self.player.position).min()
+        else:
+            min_distance = float('inf')
+
+        if min_distance != 0:  # Check if min_distance is not zero
+            self.shake_factor = min(0.5, 0.05 / min_distance)
+        else:
+            self.shake_factor = 0.5  # Default shake factor when min_distance is zero
+
+    def update_camera(self):
+        self.camera_x = max(0, min(self.player.position[0] // CELL_SIZE - SCREEN_WIDTH // (2 * CELL_SIZE),
+                                   self.maze.width - SCREEN_WIDTH // CELL_SIZE))
+        self.camera_y = max(0, min(self.player.position[1] // CELL_SIZE - SCREEN_HEIGHT // (2 * CELL_SIZE),
+                                   self.maze.height - SCREEN_HEIGHT // CELL_SIZE))
+        self.maze.prefetch(self.camera_x, self.camera_y,
+                           self.camera_x + SCREEN_WIDTH // CELL_SIZE, self.camera_y + SCREEN_HEIGHT // CELL_SIZE)
+
+    def interpolate(self, alpha):
+        # Camera, player and Death drawn alpha of the way from their places before the last
+        # tick to where they are now. Jumps of more than a cell (teleports) are not smoothed.
+        if self.previous_state is None:
+            alpha = 1
+            player_x, player_y, death, camera_x, camera_y = (self.player.position[0], self.player.position[1],
+                                                             self.death.position, self.camera_x, self.camera_y)
+        else:
+            player_x, player_y, death, camera_x, camera_y = self.previous_state
+
+        def lerp(start, end):
+            return end if abs(end - start) > CELL_SIZE else round(start + (end - start) * alpha)
+
+        self.view_x = lerp(camera_x * CELL_SIZE, self.camera_x * CELL_SIZE)
+        self.view_y = lerp(camera_y * CELL_SIZE, self.camera_y * CELL_SIZE)
+        self.player_screen = (lerp(player_x, self.player.position[0]) - self.view_x,
+                              lerp(player_y, self.player.position[1]) - self.view_y)
+        self.death_screen = (lerp(death[0] * CELL_SIZE, self.death.position[0] * CELL_SIZE) - self.view_x,
+                             lerp(death[1] * CELL_SIZE, self.death.position[1] * CELL_SIZE) - self.view_y)
+        if self.hunters is not None:
+            # Hunters only ever step one cell, every one is smoothed
+            hunters = self.hunters
+            xs = hunters.previous_xs * CELL_SIZE + np.round((hunters.xs - hunters.previous_xs) * (alpha * CELL_SIZE))
+            ys = hunters.previous_ys * CELL_SIZE + np.round((hunters.ys - hunters.previous_ys) * (alpha * CELL_SIZE))
+            self.hunters_screen = (xs.astype(np.int64) - self.view_x, ys.astype(np.int64) - self.view_y)
+
+    def render(self, alpha=1):
+        # alpha is how far real time is between the last tick and the next one
+        self.interpolate(alpha)
+        self.base_surface.fill((0, 0, 0))
+
+        # Full screen changes, everything else marks its own rects for the presenter
+        if (self.blackout_active or self.jumpscare_active or self.player.reached_endpoint or
+                (self.view_x, self.view_y) != self.presented_camera):
+            self.presenter.invalidate()
+            self.presented_camera = (self.view_x, self.view_y)
+
+        if not self.blackout_active:
+            
+            self.draw_grid(5)  # LINE OF SIGHT RADIUS
+            self.draw_player()
+            self.draw_arrow()
+            self.draw_death()
+            
+            
+            if self.player.reached_endpoint:
+                self.base_surface.fill((0, 0, 0))
+                text = self.text.render(f"Press Enter to move onto LVL{self.level + 1}", 36)
+                text_rect = text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
+                self.base_surface.blit(text, text_rect)
+            
+            if self.jumpscare_active:
+                self.jumpscare_effect()
+            
+            if self.blackout_active:
+                self.blackout_effect()
+            
+            self.draw_timer()
+
+            if self.profile_overlay is not None:
+                self.draw_profile()
+        
+        # Scale the base surface to the current screen resolution
+        self.presenter.present(self.screen, self.base_surface)
+
+    def draw_death(self):
+        x, y = self.death_screen
+        pygame.draw.rect(self.base_surface, DEATH_COLOR, (x, y, CELL_SIZE, CELL_SIZE))
+        self.presenter.mark((x, y, CELL_SIZE, CELL_SIZE))
+        if self.hunters is not None:
+            self.draw_hunters()
+
+    def draw_hunters(self):
+        # One blit per occupied on screen position, all in one blits call
+        xs, ys = self.hunters_screen
+        visible = (xs > -CELL_SIZE) & (xs < SCREEN_WIDTH) & (ys > -CELL_SIZE) & (ys < SCREEN_HEIGHT)
+        if not visible.any():
+            return
+        xs, ys = xs[visible], ys[visible]
+        # Hunters on the same spot are drawn once
+        stride = SCREEN_WIDTH + CELL_SIZE
+        keys = np.unique((ys + CELL_SIZE) * stride + xs + CELL_SIZE)
+        positions = np.column_stack((keys % stride - CELL_SIZE, keys // stride - CELL_SIZE)).tolist()
+        self.base_surface.blits([(self.hunter_surface, position) for position in positions], doreturn=False)
+        # One rect around them all, a rect each could overflow the presenter
+        x0, y0 = int(xs.min()), int(ys.min())
+        self.presenter.mark((x0, y0, int(xs.max()) - x0 + CELL_SIZE, int(ys.max()) - y0 + CELL_SIZE))
+
+    def draw_timer(self):
+        # Convert total time to hours, minutes, and seconds
+        hours = self.total_time // (TICK_RATE * 60 * 60)  # Ticks, 60 seconds, 60 minutes
+        minutes = (self.total_time // (TICK_RATE * 60)) % 60
+        seconds = (self.total_time // TICK_RATE) % 60
+            
+        # Format the time as HH:MM:SS, drawn from the glyph atlas since it changes every second
+        time_text = "{:02d}:{:02d}:{:02d}".format(hours, minutes, seconds)
+        time_rect = pygame.Rect((0, 0), self.text.glyphs_size(time_text, 36))
+        
+        # Create a box for the timer
+        timer_box_width = time_rect.width + 20  # Add some padding
+        timer_box_height = time_rect.height + 10
+        timer_box_rect = pygame.Rect((SCREEN_WIDTH - timer_box_width) // 2 + 50, 30, timer_box_width, timer_box_height)
+        
+        # Draw timer box
+        pygame.draw.rect(self.base_surface, (0, 0, 0), timer_box_rect)
+        pygame.draw.rect(self.base_surface, (255, 255, 255), timer_box_rect, 2)
+        self.presenter.mark(timer_box_rect)
+        
+        # Position timer within the timer box
+        time_rect.centerx = timer_box_rect.centerx
+        time_rect.top = timer_box_rect.top + 5
+        
+        # Blit timer to the base surface
+        self.text.draw_glyphs(self.base_surface, time_text, time_rect.topleft, 36)
+        
+        # Create a box for the level counter
+        level_box_width = 120  # Adjust as needed
+        level_box_height = time_rect.height + 10
+        level_box_rect = pygame.Rect(timer_box_rect.left - level_box_width - 10, 30, level_box_width, level_box_height)
+        
+        # Draw level counter box
+        pygame.draw.rect(self.base_surface, (0, 0, 0), level_box_rect)
+        pygame.draw.rect(self.base_surface, (255, 255, 255), level_box_rect, 2)
+        self.presenter.mark(level_box_rect)
+        
+        # Render level counter
+        level_text = self.text.render("LVL {:03d}".format(self.level), 36)
+        level_rect = level_text.get_rect()
+        
+        # Position level counter within the level counter box
+        level_rect.centerx = level_box_rect.centerx
+        level_rect.top = level_box_rect.top + 5
+        
+        # Blit level counter to the base surface
+        self.base_surface.blit(level_text, level_rect)
+
+    def render_profile(self):
+        # Table of the profiler's percentiles, rendered again every PROFILE_OVERLAY_INTERVAL frames
+        font = self.text.font(20)
+        percentiles = self.profiler.percentiles()
+        row_height = font.get_linesize()
+        surface = pygame.Surface((330, row_height * (len(PROFILE_STAGES) + 1) + 10), pygame.SRCALPHA)
+        surface.fill((0, 0, 0, 200))
+        columns = [("ms", 10), ("p50", 170), ("p95", 225), ("p99", 280)]
+        for label, x in columns:
+            surface.blit(font.render(label, True, (255, 255, 0)), (x, 5))
+        for row, stage in enumerate(PROFILE_STAGES, 1):
+            y = 5 + row * row_height
+            surface.blit(font.render(stage, True, (255, 255, 255)), (10, y))
+            for value, (_, x) in zip(percentiles.get(stage, ()), columns[1:]):
+                surface.blit(font.render(f"{value:.2f}", True, (255, 255, 255)), (x, y))
+        return surface
+
+    def draw_profile(self):
+        if self.profiler.count % PROFILE_OVERLAY_INTERVAL == 0:
+            self.profile_overlay = self.render_profile()
+        rect = self.profile_overlay.get_rect(bottomleft=(10, SCREEN_HEIGHT - 10))
+        self.base_surface.blit(self.profile_overlay, rect)
+        self.presenter.mark(rect)
+
+    def draw_grid(self, sight_radius):
+        player_grid_x = self.player.position[0] // CELL_SIZE
+        player_grid_y = self.player.position[1] // CELL_SIZE
+
+        # Placeholder for endpoint position to draw it last
+        endpoint_to_draw = None
+
+        # Only the part of the grid that is on screen and inside the sight radius. While the
+        # camera is between cells the cells it is leaving are still partly on screen.
+        x0 = max(self.view_x // CELL_SIZE, player_grid_x - sight_radius)
+        y0 = max(self.view_y // CELL_SIZE, player_grid_y - sight_radius)
+        x1 = min(-(-self.view_x // CELL_SIZE) + SCREEN_WIDTH // CELL_SIZE, player_grid_x + sight_radius + 1)
+        y1 = min(-(-self.view_y // CELL_SIZE) + SCREEN_HEIGHT // CELL_SIZE, player_grid_y + sight_radius + 1)
+
+        if x0 < x1 and y0 < y1:
+            self.presenter.mark((x0 * CELL_SIZE - self.view_x, y0 * CELL_SIZE - self.view_y,
+                                 (x1 - x0) * CELL_SIZE, (y1 - y0) * CELL_SIZE))
+            # Maze from the atlas, then everything the walls hide blacked out in one blit
+            visible, mask = self.fov.get(player_grid_x, player_grid_y, sight_radius)
+            self.atlas.draw(self.base_surface, x0, y0, x1, y1, self.view_x, self.view_y)
+            self.base_surface.blit(mask, ((player_grid_x - sight_radius) * CELL_SIZE - self.view_x,
+                                          (player_grid_y - sight_radius) * CELL_SIZE - self.view_y))
+
+            ex, ey = self.maze.endpoint_pos
+            if (x0 <= ex < x1 and y0 <= ey < y1 and
+                    visible[ey - player_grid_y + sight_radius, ex - player_grid_x + sight_radius]):
+                endpoint_to_draw = (ex * CELL_SIZE - self.view_x, ey * CELL_SIZE - self.view_y)
+
+        # Draw the wall phantoms on screen, with one rect around them all like the hunters
+        xs, ys = self.wallPhantoms.positions()
+        on_screen = self.wallPhantoms.within(self.view_x // CELL_SIZE, self.view_y // CELL_SIZE,
+                                             -(-self.view_x // CELL_SIZE) + SCREEN_WIDTH // CELL_SIZE,
+                                             -(-self.view_y // CELL_SIZE) + SCREEN_HEIGHT // CELL_SIZE)
+        if on_screen.any():
+            pulsate = (math.sin(time.time() * 5) + 1) * 0.5
+            self.phantom_surface.fill((100 * pulsate, 0, 0))
+            xs = xs[on_screen] * CELL_SIZE - self.view_x
+            ys = ys[on_screen] * CELL_SIZE - self.view_y
+            self.base_surface.blits([(self.phantom_surface, position)
+                                     for position in np.column_stack((xs, ys)).tolist()], doreturn=False)
+            x0, y0 = int(xs.min()), int(ys.min())
+            self.presenter.mark((x0, y0, int(xs.max()) - x0 + CELL_SIZE, int(ys.max()) - y0 + CELL_SIZE))
+
+        # Draw endpoint last
+        if endpoint_to_draw:
+            ex, ey = endpoint_to_draw
+            color = (0, 255, 0)  # Green color for endpoint
+            pygame.draw.rect(self.base_surface, color, (ex, ey, CELL_SIZE, CELL_SIZE))
+
+
+    def draw_player(self):
+        screen_x, screen_y = self.player_screen
+        pygame.draw.rect(self.base_surface, (255, 0, 0), (screen_x, screen_y, CELL_SIZE, CELL_SIZE))
+        self.presenter.mark((screen_x, screen_y, CELL_SIZE, CELL_SIZE))
+
+    def arrow_spin(self):
+        # Amplitude and speed of the arrow's spin, from the phantoms within 20 cells
+        max_distance = math.sqrt(GRID_WIDTH ** 2 + GRID_HEIGHT ** 2) * CELL_SIZE
+        distances = self.wallPhantoms.distances(self.player.position)
+        nearby_distances = distances[distances <= 20 * CELL_SIZE]
+        return float((max_distance - nearby_distances).sum()) / 3, 0.005 * len(nearby_distances)
+
+    def draw_arrow(self):
+        dx = self.maze.endpoint_pos[0] * CELL_SIZE - self.player.position[0]
+        dy = self.maze.endpoint_pos[1] * CELL_SIZE - self.player.position[1]
+        angle = math.atan2(dy, dx)
+
+        spin_factor, spin_speed = self.arrow_spin()
+
+        if self.shake_factor > 0:
+            angle += self.shake_factor * math.sin(time.time() * ARROW_SHAKE_SPEED)
+
+        angle += spin_factor * math.sin(time.time() * spin_speed)
+
+        x = self.player_screen[0] + CELL_SIZE // 2
+        y = self.player_screen[1] + CELL_SIZE // 2
+        length = ARROW_LENGTH
+        target_x = x + length * math.cos(angle)
+        target_y = y + length * math.sin(angle)
+        line_rect = pygame.draw.line(self.base_surface, (255, 255, 0), (x, y), (target_x, target_y), 3)
+        head_rect = pygame.draw.polygon(self.base_surface, (255, 255, 0), ((target_x, target_y),
+                                                            (target_x - 8 * math.cos(angle + math.pi / 6),
+                                                                target_y - 8 * math.sin(angle + math.pi / 6)),
+                                                            (target_x - 8 * math.cos(angle - math.pi / 6),
+                                                                target_y - 8 * math.sin(angle - math.pi / 6))))
+        self.presenter.mark(line_rect.union(head_rect))
+
+    def jumpscare_effect(self):
+        # Instant red screen at the beginning
+        jumpscare_ticks = self.scheduler.tick - self.jumpscare_started
+        if jumpscare_ticks < TICK_RATE:  # Duration of instant red screen (1 second)
+            alpha = 255
+        else:
+            # Smoothly fade out the red screen
+            alpha = max(0, 255 - int((jumpscare_ticks - TICK_RATE) * 255 / (2 * TICK_RATE)))  # Linear fade-out (2 seconds)
+
+        jumpscare_surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
+        jumpscare_surface.fill((255, 0, 0, alpha))
+        self.base_surface.blit(jumpscare_surface, (0, 0))
+
+
+    def blackout_effect(self):
+        # Draw continuous blackout effect after jumpscare, the scheduler ends it
+        if self.blackout_active:
+            alpha = min(128, int((self.scheduler.tick - self.blackout_started) * 128 / (3 * TICK_RATE)))  # Linear fade-in (3 seconds)
+        else:
+            alpha = 0
+
+        blackout_surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
+        blackout_surface.fill((0, 0, 0, alpha))
+        self.screen.blit(blackout_surface, (0, 0))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Order of the Orderless")
+    parser.add_argument("--headless", action="store_true",
+                        help="simulate the game without a display as fast as possible and report ticks per second")
+    parser.add_argument("--ticks", type=int, help="headless: number of ticks to simulate")
+    parser.add_argument("--levels", type=int, help="headless: stop after this many levels were finished")
+    parser.add_argument("--seed", type=int, help="seed for the mazes, enemies and the headless bot")
+    parser.add_argument("--mode", choices=REPLAY_MODES, default="Normal",
+                        help="headless: game mode to simulate")
+    parser.add_argument("--maze-algorithm", choices=list(Maze.generators), default=MAZE_ALGORITHM,
+                        help="how the levels are generated")
+    parser.add_argument("--fps", type=int, default=FPS,
+                        help="frames per second to render, 0 for no cap; the game always runs at the same speed")
+    parser.add_argument("--full-rate", action="store_true",
+                        help="keep the full frame rate while the screen is idle")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="profile every frame and write the last ones to FILE (.csv or .json) on quit")
+    parser.add_argument("--record", metavar="FILE", help="record the input of this session to FILE")
+    parser.add_argument("--replay", metavar="FILE",
+                        help="play a recorded session back, as fast as possible with --headless")
+    parser.add_argument("--save", metavar="FILE",
+                        help=f"save the game to FILE every {AUTOSAVE_INTERVAL} seconds of play and on quit")
+    parser.add_argument("--resume", metavar="FILE", help="continue the game saved in FILE")
+    parser.add_argument("--startup-time", action="store_true",
+                        help="print the time to the first menu frame and to load the audio, then quit")
+    args = parser.parse_args()
+
+    playback = None
+    if args.replay:
+        # The recording decides the seed and the maze algorithm
+        playback = InputPlayback(args.replay)
+        args.seed, args.maze_algorithm = playback.seed, playback.algorithm
+
+    if args.headless and playback:
+        game = Game(headless=True, maze_algorithm=args.maze_algorithm, seed=args.seed)
+        game.playback = playback
+        ticks, elapsed = game.replay()
+        print(f"{ticks} ticks in {elapsed:.3f}s ({ticks / max(elapsed, 1e-9):.0f} ticks/s), "
+              f"ended on level {game.level} after {game.deaths} deaths")
+    elif args.headless:
+        if args.ticks is None and args.levels is None:
+            args.ticks = 10000
+        game = Game(headless=True, maze_algorithm=args.maze_algorithm, seed=args.seed)
+        if args.resume:
+            game.load_snapshot(args.resume)
+        else:
+            game.start_game(args.mode)
+        ticks, elapsed = game.simulate(args.ticks, args.levels, bot_seed=args.seed)
+        print(f"{ticks} ticks in {elapsed:.3f}s ({ticks / max(elapsed, 1e-9):.0f} ticks/s), "
+              f"{game.levels_completed} levels completed, {game.deaths} deaths")
+        if args.save:
+            game.autosave = SnapshotWriter(args.save)
+            game.save()
+            game.autosave.close()
+    else:
+        game = Game(maze_algorithm=args.maze_algorithm, seed=args.seed)
+        game.adaptive_pacing = not args.full_rate
+        game.render_fps = args.fps
+        game.playback = playback
+        if args.record:
+            game.recorder = InputRecorder(args.record, game.rng.seed, args.maze_algorithm)
+        if args.save:
+            game.autosave = SnapshotWriter(args.save)
+        if args.resume:
+            game.load_snapshot(args.resume)
+        if args.profile:
+            game.profile_path = args.profile
+            game.profiler.enable(game)
+        if args.startup_time:
+            pygame.event.post(pygame.event.Event(pygame.QUIT))  # Seen right after the first frame
+        game.run()
+        if args.startup_time:
+            print(f"first frame after {game.first_frame_time * 1e3:.1f} ms, "
+                  f"audio loaded in {game.audio.load_time * 1e3:.1f} ms "
+                  f"({game.audio.counters['decoded']} decoded, {game.audio.counters['cache_loaded']} from cache)")
     
\ No newline at end of file
@@ -0,0 +1,390 @@
+import os
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import asyncio
+import random
+import statistics
+import struct
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pygame
+
+import main
+
+# Network
+HOST = "127.0.0.1"
+PORT = 7373
+MAX_PLAYERS = 2
+MAX_CLIENT_BUFFER = 1 << 20  # Bytes queued for a client before it is dropped as too slow
+
+# Messages are a header then the payload, all little endian
+HEADER = struct.Struct("<BI")  # Message type, payload length
+HELLO = struct.Struct("<B")  # Client -> server: role
+WELCOME = struct.Struct("<B")  # Server -> client: player number, SPECTATOR if watching
+INPUT = struct.Struct("<B")  # Client -> server: 0 to stand still, 1 + index into main.DIRECTIONS to move
+MAZE = struct.Struct("<IHHHH")  # Level, width, height, exit x, exit y, then the open cells one bit each
+DELTA = struct.Struct("<IQBH")  # Tick, server clock when sent (ns), phantom count, records
+RECORD = struct.Struct("<BBHH")  # Entity kind, number, x, y
+MSG_HELLO, MSG_WELCOME, MSG_INPUT, MSG_MAZE, MSG_DELTA = range(5)
+ROLE_SPECTATOR, ROLE_PLAYER = range(2)
+SPECTATOR = 0xFF
+ENTITY_PLAYER, ENTITY_DEATH, ENTITY_PHANTOM = range(3)
+
+# Viewer
+VIEWER_SIZE = (800, 800)
+PLAYER_COLORS = [(255, 255, 0), (0, 160, 255)]
+PHANTOM_COLOR = (120, 120, 120)
+
+# Load test
+LOAD_TEST_CLIENTS = 100
+LOAD_TEST_SECONDS = 10
+BOT_INPUT_INTERVAL = 0.3  # Seconds between the load test players' direction changes
+
+
+def message(kind, payload=b""):
+    return HEADER.pack(kind, len(payload)) + payload
+
+
+async def read_message(reader):
+    kind, length = HEADER.unpack(await reader.readexactly(HEADER.size))
+    return kind, await reader.readexactly(length)
+
+
+def encode_maze(level, maze):
+    # One bit per cell, set where it is open: a 30x30 level is 113 bytes
+    return message(MSG_MAZE, MAZE.pack(level, maze.width, maze.height, *maze.endpoint_pos) +
+                   np.packbits(maze.grid.ravel() == 0).tobytes())
+
+
+def encode_delta(tick, state, previous, phantom_count):
+    # Only the entities whose cell differs from previous, which is empty for a full snapshot
+    records = [RECORD.pack(kind, number, x, y) for (kind, number), (x, y) in state.items()
+               if previous.get((kind, number)) != (x, y)]
+    return message(MSG_DELTA, DELTA.pack(tick, time.monotonic_ns(), phantom_count, len(records)) + b"".join(records))
+
+
+class RaceServer:
+    # Owns the authoritative race: the level's maze, the players, the wall phantoms and
+    # Death, simulated at TICK_RATE with the game's own classes. Every client gets the
+    # maze once per level, then one delta per tick with the entities that moved, the
+    # same bytes for everyone. Death hunts whichever player is closest to the exit; a
+    # caught player goes back to the start, and the first one out wins the level.
+    def __init__(self, seed=None, players=MAX_PLAYERS, maze_algorithm=main.MAZE_ALGORITHM, tick_rate=main.TICK_RATE):
+        self.rng = main.RandomStreams(seed)
+        self.tick_rate = tick_rate
+        self.scheduler = main.Scheduler(tick_rate)
+        self.pipeline = main.LevelPipeline(self.rng.maze.getrandbits(32), headless=True, algorithm=maze_algorithm)
+        self.players = [main.Player(None, clock=self.scheduler) for _ in range(players)]
+        self.directions = [0] * players
+        self.controllers = [None] * players  # Writer of the client steering each player
+        self.wins = [0] * players
+        self.phantoms = main.PhantomPool(255)
+        self.enemy_spawn_interval = 35
+        self.spawn_event = None
+        self.death = None
+        self.clients = set()
+        self.previous = {}
+        self.bytes_sent = 0
+        self.start_level()
+
+    def start_level(self):
+        self.level = self.pipeline.next()
+        self.maze = self.level.maze
+        for player in self.players:
+            player.maze = self.maze
+            player.reset()
+        if self.death is not None:
+            self.death.stop()
+        self.death = main.Death(self.maze, self.players[0], self.scheduler, self.level.field, rng=self.rng.death)
+        self.phantoms.clear()
+        self.scheduler.cancel(self.spawn_event)
+        self.spawn_event = self.scheduler.schedule(self.enemy_spawn_interval, self.spawn_phantom)
+        self.maze_message = encode_maze(self.level.index, self.maze)
+        self.previous = {}  # The next delta is a full snapshot
+        self.broadcast(self.maze_message)
+
+    def spawn_phantom(self):
+        self.spawn_event = self.scheduler.schedule(self.enemy_spawn_interval, self.spawn_phantom)
+        if not self.phantoms.full():
+            self.phantoms.spawn(*self.maze.random_open(self.rng.phantoms, *self.cell(self.players[0])))
+
+    @staticmethod
+    def cell(player):
+        return player.position[0] // main.CELL_SIZE, player.position[1] // main.CELL_SIZE
+
+    def leader(self):
+        cells = self.maze.open_cells()
+        return min(self.players, key=lambda player: cells.from_exit[cells.numbers[self.cell(player)[::-1]]])
+
+    def state(self):
+        state = {(ENTITY_PLAYER, i): self.cell(player) for i, player in enumerate(self.players)}
+        state[(ENTITY_DEATH, 0)] = self.death.position
+        xs, ys = self.phantoms.positions()
+        for i, (x, y) in enumerate(zip(xs.tolist(), ys.tolist())):
+            state[(ENTITY_PHANTOM, i)] = (x, y)
+        return state
+
+    def tick(self):
+        for player, direction in zip(self.players, self.directions):
+            dx, dy = main.DIRECTIONS[direction - 1] if direction else (0, 0)
+            player.direction = [dx * main.PLAYER_SPEED, dy * main.PLAYER_SPEED]
+        self.death.player = self.leader()
+        self.scheduler.advance()  # Death and phantom spawns
+
+        for i, player in enumerate(self.players):
+            player.move()
+            if player.reached_endpoint:
+                self.wins[i] += 1
+                self.start_level()
+                break
+            cell = self.cell(player)
+            if self.phantoms.occupied(*cell):
+                # A phantom throws the player somewhere else in the maze
+                self.phantoms.remove(*cell)
+                x, y = self.maze.random_open(self.rng.teleport, *cell)
+                player.position = [x * main.CELL_SIZE, y * main.CELL_SIZE]
+            elif cell == self.death.position:
+                player.reset()
+
+        state = self.state()
+        self.broadcast(encode_delta(self.scheduler.tick, state, self.previous, len(self.phantoms)))
+        self.previous = state
+
+    def broadcast(self, data):
+        for writer in list(self.clients):
+            if writer.transport.get_write_buffer_size() > MAX_CLIENT_BUFFER:
+                self.drop(writer)
+            else:
+                writer.write(data)
+                self.bytes_sent += len(data)
+
+    def drop(self, writer):
+        self.clients.discard(writer)
+        for i, controller in enumerate(self.controllers):
+            if controller is writer:
+                self.controllers[i] = None
+                self.directions[i] = 0
+        writer.close()
+
+    async def handle_client(self, reader, writer):
+        number = SPECTATOR
+        try:
+            kind, payload = await read_message(reader)
+            if kind == MSG_HELLO and HELLO.unpack(payload)[0] == ROLE_PLAYER and None in self.controllers:
+                number = self.controllers.index(None)
+                self.controllers[number] = writer
+            writer.write(message(MSG_WELCOME, WELCOME.pack(number)) + self.maze_message +
+                         encode_delta(self.scheduler.tick, self.previous or self.state(), {}, len(self.phantoms)))
+            self.clients.add(writer)
+            while True:
+                kind, payload = await read_message(reader)
+                if kind == MSG_INPUT and number != SPECTATOR:
+                    self.directions[number] = min(INPUT.unpack(payload)[0], len(main.DIRECTIONS))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.drop(writer)
+
+    async def run_ticks(self):
+        # Fixed rate ticks, a late tick is caught up on straight away instead of skipped
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            self.tick()
+            next_tick += 1 / self.tick_rate
+            await asyncio.sleep(max(0, next_tick - loop.time()))
+
+    async def serve(self, host=HOST, port=PORT):
+        server = await asyncio.start_server(self.handle_client, host, port)
+        print(f"Serving on {host}:{port}", flush=True)
+        async with server:
+            await self.run_ticks()
+
+
+class RemoteState:
+    # A client's copy of the race, rebuilt from the server's messages
+    def __init__(self):
+        self.number = None
+        self.level = None
+        self.grid = None
+        self.exit = None
+        self.tick = 0
+        self.sent_ns = 0
+        self.players = {}
+        self.death = None
+        self.phantoms = []
+
+    def apply(self, kind, payload):
+        if kind == MSG_WELCOME:
+            self.number = WELCOME.unpack(payload)[0]
+        elif kind == MSG_MAZE:
+            self.level, width, height, exit_x, exit_y = MAZE.unpack_from(payload)
+            bits = np.unpackbits(np.frombuffer(payload, dtype=np.uint8, offset=MAZE.size), count=width * height)
+            self.grid = (1 - bits).reshape(height, width)  # Same as Maze.grid, 1 for walls
+            self.exit = (exit_x, exit_y)
+            self.players.clear()
+            self.phantoms.clear()
+        elif kind == MSG_DELTA:
+            self.tick, self.sent_ns, phantom_count, count = DELTA.unpack_from(payload)
+            del self.phantoms[phantom_count:]
+            self.phantoms.extend([None] * (phantom_count - len(self.phantoms)))
+            for kind, number, x, y in RECORD.iter_unpack(payload[DELTA.size:DELTA.size + count * RECORD.size]):
+                if kind == ENTITY_PLAYER:
+                    self.players[number] = (x, y)
+                elif kind == ENTITY_DEATH:
+                    self.death = (x, y)
+                else:
+                    self.phantoms[number] = (x, y)
+
+
+async def connect(host, port, role):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(message(MSG_HELLO, HELLO.pack(role)))
+    return reader, writer
+
+
+async def watch(host, port, play=False):
+    # Draws the whole maze scaled to the window. As a player the arrow keys steer.
+    reader, writer = await connect(host, port, ROLE_PLAYER if play else ROLE_SPECTATOR)
+    state = RemoteState()
+    pygame.display.init()
+    screen = pygame.display.set_mode(VIEWER_SIZE)
+    pygame.display.set_caption("Order of the Orderless - spectator")
+    keys = {pygame.K_UP: 1, pygame.K_RIGHT: 2, pygame.K_DOWN: 3, pygame.K_LEFT: 4}
+    background = None
+    level = None
+
+    async def receive():
+        while True:
+            state.apply(*await read_message(reader))
+
+    receiver = asyncio.create_task(receive())
+    try:
+        while not receiver.done():
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                    return
+                if event.type == pygame.KEYDOWN and event.key in keys:
+                    writer.write(message(MSG_INPUT, INPUT.pack(keys[event.key])))
+                elif event.type == pygame.KEYUP and event.key in keys:
+                    writer.write(message(MSG_INPUT, INPUT.pack(0)))
+
+            if state.grid is not None:
+                height, width = state.grid.shape
+                scale = min(VIEWER_SIZE[0] / width, VIEWER_SIZE[1] / height)
+                if state.level != level:
+                    # The maze only changes between levels, it is drawn once then scaled
+                    cells = (state.grid == 0).astype(np.uint8)
+                    cells[state.exit[1], state.exit[0]] = 2
+                    surface = pygame.Surface((width, height), depth=8)
+                    surface.set_palette(main.ATLAS_PALETTE)
+                    pygame.surfarray.blit_array(surface, cells.T)
+                    background = pygame.transform.scale(surface, (round(width * scale), round(height * scale)))
+                    level = state.level
+                screen.fill((0, 0, 0))
+                screen.blit(background, (0, 0))
+                size = max(1, round(scale))
+                for x, y in filter(None, state.phantoms):
+                    pygame.draw.rect(screen, PHANTOM_COLOR, (x * scale, y * scale, size, size))
+                if state.death is not None:
+                    pygame.draw.rect(screen, main.DEATH_COLOR, (state.death[0] * scale, state.death[1] * scale, size, size))
+                for number, (x, y) in state.players.items():
+                    pygame.draw.rect(screen, PLAYER_COLORS[number % len(PLAYER_COLORS)],
+                                     (x * scale, y * scale, size, size))
+                pygame.display.flip()
+            await asyncio.sleep(1 / main.FPS)
+    finally:
+        receiver.cancel()
+        writer.close()
+        pygame.quit()
+
+
+async def spectate(host, port, seconds, stats):
+    # A load test client: counts bytes and measures each delta's latency from the
+    # server's clock, which is only comparable because both run on this machine
+    reader, writer = await connect(host, port, ROLE_SPECTATOR)
+    state = RemoteState()
+    received = 0
+    latencies = []
+    deadline = time.monotonic() + seconds
+    try:
+        while time.monotonic() < deadline:
+            kind, payload = await read_message(reader)
+            received += HEADER.size + len(payload)
+            state.apply(kind, payload)
+            if kind == MSG_DELTA:
+                latencies.append((time.monotonic_ns() - state.sent_ns) / 1e6)
+    finally:
+        writer.close()
+    stats.append((received, latencies))
+
+
+async def discard(reader):
+    while await reader.read(1 << 16):
+        pass
+
+
+async def steer(host, port, seconds, seed):
+    # A load test player pressing random directions
+    reader, writer = await connect(host, port, ROLE_PLAYER)
+    rng = random.Random(seed)
+    deadline = time.monotonic() + seconds
+    drain = asyncio.create_task(discard(reader))  # Its copy of the race is not needed
+    try:
+        while time.monotonic() < deadline:
+            writer.write(message(MSG_INPUT, INPUT.pack(rng.randint(0, len(main.DIRECTIONS)))))
+            await asyncio.sleep(BOT_INPUT_INTERVAL)
+    finally:
+        drain.cancel()
+        writer.close()
+
+
+async def load_test(clients=LOAD_TEST_CLIENTS, seconds=LOAD_TEST_SECONDS, port=PORT, seed=0):
+    # Runs a server in its own process, two random players and clients spectators on it
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--port", str(port), "--seed", str(seed)],
+                              stdout=subprocess.PIPE, text=True)
+    try:
+        server.stdout.readline()  # "Serving on ..."
+        stats = []
+        await asyncio.gather(*[steer(HOST, port, seconds, seed + i) for i in range(MAX_PLAYERS)],
+                             *[spectate(HOST, port, seconds, stats) for _ in range(clients)])
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies = np.concatenate([np.array(client_latencies) for _, client_latencies in stats])
+    bandwidth = [received / seconds for received, _ in stats]
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    print(f"{clients} spectators for {seconds}s: {statistics.mean(bandwidth):.0f} bytes/s per client "
+          f"(min {min(bandwidth):.0f}, max {max(bandwidth):.0f}), "
+          f"{len(latencies) / clients / seconds:.1f} deltas/s each")
+    print(f"tick latency p50 {p50:.2f} ms, p95 {p95:.2f} ms, p99 {p99:.2f} ms, max {latencies.max():.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Order of the Orderless race server")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--seed", type=int, help="seed for the mazes, Death and the phantoms")
+    parser.add_argument("--maze-algorithm", choices=list(main.Maze.generators), default=main.MAZE_ALGORITHM)
+    parser.add_argument("--connect", metavar="HOST", help="watch the race on HOST instead of serving it")
+    parser.add_argument("--play", action="store_true", help="with --connect: take a player slot, arrow keys steer")
+    parser.add_argument("--load-test", action="store_true",
+                        help="run a server and spectators on localhost, report bandwidth and tick latency")
+    parser.add_argument("--clients", type=int, default=LOAD_TEST_CLIENTS, help="load test: spectators")
+    parser.add_argument("--seconds", type=int, default=LOAD_TEST_SECONDS, help="load test: how long to watch")
+    args = parser.parse_args()
+
+    try:
+        if args.load_test:
+            asyncio.run(load_test(args.clients, args.seconds, args.port, args.seed or 0))
+        elif args.connect:
+            asyncio.run(watch(args.connect, args.port, args.play))
+        else:
+            asyncio.run(RaceServer(args.seed, maze_algorithm=args.maze_algorithm).serve(port=args.port))
+    except KeyboardInterrupt:
+        pass